@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Records per second, MB per second and peak memory of the conversions between the formats
+
+Generates seeded synthetic inputs of each size in each input format
+and converts every input into every output format with convertDNA, as the web interface does.
+Each conversion runs in a new process, whose peak resident memory (ru_maxrss) is reported,
+together with the peak before the conversion, which is the cost of the interpreter and the imports.
+The results are written as JSON, so the runs on different versions can be compared.
+Run from the repository root: python -m benchmarks.bench_conversion --sizes 1000 100000 --output results.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+from benchmarks.datasets import GENERATORS, generate_file
+
+# the formats written in the benchmark, the input formats are GENERATORS
+OUTPUT_FORMATS = ['fasta', 'fastq', 'fasta_gbexport', 'moid_fas', 'tab']
+
+
+def _peak_rss() -> int:
+    """Returns the peak resident memory of the current process in bytes"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux kilobytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def run_conversion(input_path: str, output_path: str, informat_name: str, outformat_name: str) -> Tuple[float, int, int]:
+    """
+    Converts the file, runs in a new process
+
+    Returns the time of the conversion and the peak memory before and after it
+    """
+    from dna.DNAconvert import convertDNA, parse_format
+    informat = parse_format(informat_name, ext_pair=("", ""))
+    outformat = parse_format(outformat_name, ext_pair=("", ""))
+    warnings.simplefilter('ignore')
+    baseline = _peak_rss()
+    start = time.perf_counter()
+    with open(input_path) as infile, open(output_path, mode='w') as outfile:
+        convertDNA(infile, outfile, informat=informat, outformat=outformat)
+    elapsed = time.perf_counter() - start
+    return elapsed, baseline, _peak_rss()
+
+
+def measure(input_path: str, output_path: str, informat_name: str, outformat_name: str, records: int) -> Dict[str, Any]:
+    """Returns the result of one conversion as a JSON object"""
+    input_size = os.path.getsize(input_path)
+    result: Dict[str, Any] = {'input': informat_name, 'output': outformat_name, 'records': records, 'input_bytes': input_size}
+    # a new interpreter for each conversion, so the peak memory is not shared between them
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+        try:
+            elapsed, baseline, peak = executor.submit(run_conversion, input_path, output_path, informat_name, outformat_name).result()
+        except Exception as e:
+            # some conversions are impossible, like FASTA without quality scores to FastQ
+            result['error'] = f"{type(e).__name__}: {e}"
+            return result
+    result.update({
+        'seconds': elapsed,
+        'output_bytes': os.path.getsize(output_path),
+        'records_per_second': records / elapsed if elapsed else None,
+        'mb_per_second': input_size / 1e6 / elapsed if elapsed else None,
+        'baseline_rss_mb': baseline / 1e6,
+        'peak_rss_mb': peak / 1e6,
+    })
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000],
+                        help="numbers of records, up to 10000000")
+    parser.add_argument('--length', type=int, default=200, help="the length of the sequences")
+    parser.add_argument('--inputs', nargs='+', choices=list(GENERATORS), default=list(GENERATORS))
+    parser.add_argument('--outputs', nargs='+', choices=OUTPUT_FORMATS, default=OUTPUT_FORMATS)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="the JSON file of the results, the standard output by default")
+    args = parser.parse_args()
+
+    results: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        output_path = os.path.join(tmpdir, 'output')
+        for records in args.sizes:
+            for informat_name in args.inputs:
+                input_path = os.path.join(tmpdir, 'input')
+                generate_file(input_path, informat_name, records, args.length, args.seed)
+                for outformat_name in args.outputs:
+                    result = measure(input_path, output_path, informat_name, outformat_name, records)
+                    results.append(result)
+                    if 'error' in result:
+                        summary = result['error']
+                    else:
+                        summary = f"{result['records_per_second']:10.0f} records/s {result['mb_per_second']:8.1f} MB/s {result['peak_rss_mb']:8.1f} MB peak"
+                    print(f"{records:>9} {informat_name:>14} -> {outformat_name:<14} {summary}", file=sys.stderr)
+
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'seed': args.seed,
+        'length': args.length,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, mode='w') as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
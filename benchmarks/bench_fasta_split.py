@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Throughput of the FASTA splitters
+
+Compares the line-based split_file with the block-based fasta_records
+on a generated multi-line FASTA file read from disk.
+Run from the repository root: python -m benchmarks.bench_fasta_split
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.datasets import generate_file
+from dna.library.fasta import split_file, fasta_records
+
+
+def run_split_file(path: str) -> int:
+    count = 0
+    with open(path) as file:
+        for chunk in split_file(file):
+            _ = chunk[0][1:], "".join(chunk[1:])
+            count += 1
+    return count
+
+
+def run_fasta_records(path: str) -> int:
+    count = 0
+    with open(path) as file:
+        for _ in fasta_records(file):
+            count += 1
+    return count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--records', type=int, default=100_000)
+    parser.add_argument('--length', type=int, default=600)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'input.fas')
+        generate_file(path, 'fasta', args.records, args.length)
+        megabytes = os.path.getsize(path) / 1e6
+        for name, splitter in [('split_file', run_split_file), ('fasta_records', run_fasta_records)]:
+            best = float('inf')
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                count = splitter(path)
+                best = min(best, time.perf_counter() - start)
+            print(f"{name:>14}: {count} records, {megabytes / best:8.1f} MB/s, {count / best:10.0f} records/s")
+
+
+if __name__ == '__main__':
+    main()
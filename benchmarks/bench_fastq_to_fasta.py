@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Reads per second of the FastQ to FASTA conversion
+
+Compares the text-based FastQFile.to_fasta with the binary FastQFile.to_fasta_bytes
+on a generated FastQ file on disk.
+Run from the repository root: python -m benchmarks.bench_fastq_to_fasta
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.datasets import generate_file
+from dna.library.fasta import FastQFile
+
+
+def run_text(input_path: str, output_path: str) -> None:
+    with open(input_path) as infile, open(output_path, mode='w') as outfile:
+        FastQFile.to_fasta(infile, outfile)
+
+
+def run_bytes(input_path: str, output_path: str) -> None:
+    with open(input_path, mode='rb') as infile, open(output_path, mode='wb') as outfile:
+        FastQFile.to_fasta_bytes(infile, outfile)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--reads', type=int, default=1_000_000)
+    parser.add_argument('--length', type=int, default=150)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        input_path = os.path.join(tmpdir, 'input.fastq')
+        output_path = os.path.join(tmpdir, 'output.fas')
+        # the quality scores can start with '@'
+        generate_file(input_path, 'fastq', args.reads, args.length)
+        megabytes = os.path.getsize(input_path) / 1e6
+        for name, converter in [('to_fasta', run_text), ('to_fasta_bytes', run_bytes)]:
+            best = float('inf')
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                converter(input_path, output_path)
+                best = min(best, time.perf_counter() - start)
+            print(f"{name:>15}: {args.reads / best:10.0f} reads/s, {megabytes / best:8.1f} MB/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Import time of the modules that the server and the command line load at start
+
+Imports each module in a new interpreter with python -X importtime
+and reports its cumulative import time and the slowest imports under it.
+The modules that cannot be imported, like the web ones without Flask, are reported with the error.
+The results are written as JSON, so the startup regressions can be tracked.
+Run from the repository root: python -m benchmarks.bench_import --output import_times.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from typing import Any, Dict, List, Tuple
+
+# the modules imported at the start of the command line and the server
+MODULES = ['dna.library.formats', 'dna.cli', 'dna.library.fasta', 'dna.batch', 'dna.views']
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """Returns the imports in the output of -X importtime: the module, the self and the cumulative time in microseconds"""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_time, cumulative, module = line[len('import time:'):].split('|')
+        imports.append((module.strip(), int(self_time), int(cumulative)))
+    return imports
+
+
+def measure(module: str, repeat: int, top: int) -> Dict[str, Any]:
+    """Returns the import time of the module, the best of repeat runs"""
+    best: Dict[str, Any] = {'module': module}
+    for _ in range(repeat):
+        process = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                                 capture_output=True, text=True, cwd=os.getcwd())
+        if process.returncode:
+            # the last line of the traceback
+            return {'module': module, 'error': process.stderr.strip().splitlines()[-1]}
+        imports = parse_importtime(process.stderr)
+        cumulative = next(cumulative for name, _, cumulative in imports if name == module)
+        if 'microseconds' not in best or cumulative < best['microseconds']:
+            slowest = sorted(imports, key=lambda item: item[1], reverse=True)[:top]
+            best.update({
+                'microseconds': cumulative,
+                'modules_imported': len(imports),
+                'slowest': [{'module': name, 'self_microseconds': self_time} for name, self_time, _ in slowest],
+            })
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('modules', nargs='*', default=MODULES)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help="the number of the slowest imports reported")
+    parser.add_argument('--output', help="the JSON file of the results, the standard output by default")
+    args = parser.parse_args()
+
+    results = []
+    for module in args.modules:
+        result = measure(module, args.repeat, args.top)
+        results.append(result)
+        if 'error' in result:
+            summary = result['error']
+        else:
+            summary = f"{result['microseconds'] / 1000:8.1f} ms, {result['modules_imported']} modules"
+        print(f"{module:>20}: {summary}", file=sys.stderr)
+
+    report = {'python': platform.python_version(), 'platform': platform.platform(), 'results': results}
+    if args.output:
+        with open(args.output, mode='w') as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Speed of sanitize on specimen tables
+
+Compares the uncached sanitize with the cached one
+on the fields of a generated specimen table, where the values repeat like in real data.
+Run from the repository root: python -m benchmarks.bench_sanitize
+"""
+
+import argparse
+import random
+import re
+import time
+import unicodedata
+from typing import List
+
+from benchmarks.datasets import EPITHETS, GENERA, VOUCHER_PREFIXES
+from dna.library.ext_ASCII_conv_table import ext_ascii_trans
+from dna.library.utils import sanitize
+
+
+# unlike in benchmarks.datasets, some names are not ASCII, so the slow path is measured too
+COUNTRIES = ['Madagascar', 'Comoros', 'Mauritius', 'Réunion', 'Mayotte']
+LOCALITIES = ['Ranomafana', 'Andasibe', 'Montagne d\'Ambre', 'Nosy Bé', 'Marojejy', 'Tsaratanana']
+
+
+def generate_table(records: int, seed: int = 0) -> List[List[str]]:
+    """Returns the rows of a specimen table: species, specimen_voucher, country, locality"""
+    rnd = random.Random(seed)
+    return [[f"{rnd.choice(GENERA)} {rnd.choice(EPITHETS)}",
+             f"{rnd.choice(VOUCHER_PREFIXES)} {rnd.randrange(10000)}/{rnd.randrange(2000, 2020)}",
+             rnd.choice(COUNTRIES),
+             rnd.choice(LOCALITIES)]
+            for _ in range(records)]
+
+
+def sanitize_uncached(s: str) -> str:
+    """The implementation of sanitize before the fast path"""
+    s = unicodedata.normalize('NFKC', s).translate(ext_ascii_trans)
+    return '_'.join(part for part in (re.split(r'[^a-zA-Z0-9]+', s)) if part)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--records', type=int, default=200_000)
+    args = parser.parse_args()
+
+    table = generate_table(args.records)
+    values = [value for row in table for value in row]
+    for name, function in [('uncached', sanitize_uncached), ('sanitize', sanitize)]:
+        start = time.perf_counter()
+        for value in values:
+            function(value)
+        elapsed = time.perf_counter() - start
+        print(f"{name:>10}: {len(values) / elapsed:12.0f} values/s")
+    print(sanitize.cache_info())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Memory and speed of Unicifier on many read names
+
+Compares the dictionary of seen names, used before NameTable, with the current Unicifier
+on generated read names, where a part of the names repeat.
+The names are generated during the measurement, like they are read from a file,
+so the memory includes the names kept alive by the unicifier.
+The memory is the peak of the allocations measured by tracemalloc in a separate run.
+Run from the repository root: python -m benchmarks.bench_unicifier
+"""
+
+import argparse
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+from dna.library.utils import Unicifier
+
+
+def read_name(i: int) -> str:
+    """Returns the name of the i-th read in the style of Illumina, every tenth one repeats an earlier name"""
+    if i % 10 == 9:
+        i //= 2
+    return f"M00{i % 899 + 100}:{i % 97 + 1}:000000000-A{i % 8999 + 1000}:1:{i % 1018 + 1101}:{i % 19999 + 10000}:{i}"
+
+
+class DictUnicifier():
+    """The memorization-based Unicifier before NameTable"""
+
+    def __init__(self) -> None:
+        self._sep = '_'
+        self._seen_name: Dict[str, int] = {}
+
+    def unique(self, name: str) -> str:
+        uniquename = name
+        try:
+            uniquename = name + self._sep + str(self._seen_name[name])
+        except KeyError:
+            self._seen_name[name] = 1
+        else:
+            self._seen_name[name] += 1
+        return uniquename
+
+
+def measure(make: Callable[[], Callable[[str], str]], count: int) -> Tuple[float, float]:
+    """Returns the names per second and the peak memory in MiB of the unicifier made by make"""
+    unique = make()
+    start = time.perf_counter()
+    for i in range(count):
+        unique(read_name(i))
+    elapsed = time.perf_counter() - start
+    del unique
+
+    tracemalloc.start()
+    unique = make()
+    for i in range(count):
+        unique(read_name(i))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return count / elapsed, peak / (1 << 20)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--names', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    variants: List[Tuple[str, Callable[[], Callable[[str], str]]]] = [
+        ('names only', lambda: str),
+        ('dict', lambda: DictUnicifier().unique),
+        ('NameTable', lambda: Unicifier().unique),
+        ('limit 25', lambda: Unicifier(25).unique),
+    ]
+    for label, make in variants:
+        speed, memory = measure(make, args.names)
+        print(f"{label:>10}: {speed:12.0f} names/s {memory:10.1f} MiB")
+
+
+if __name__ == '__main__':
+    main()
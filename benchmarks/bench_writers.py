@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Records per second of the FASTA-type writers
+
+Sends generated records to each writer of dna.library.fasta and writes the output to a file on disk.
+Run from the repository root: python -m benchmarks.bench_writers
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+import warnings
+from typing import List
+
+from dna.library import fasta
+from dna.library.record import Record
+
+
+WRITERS = ['Fastafile', 'FastQFile', 'GenbankFastaFile', 'MoidFastaFile', 'HapviewFastafile']
+FIELDS = ['seqid', 'species', 'specimen_voucher', 'sequence', 'quality_score_identifier', 'quality_score']
+
+
+def generate_records(count: int, length: int, seed: int = 0) -> List[Record]:
+    """Returns records with all the fields needed by the writers"""
+    rnd = random.Random(seed)
+    sequences = ["".join(rnd.choices("ACGT", k=length)) for _ in range(1000)]
+    return [Record(seqid=f"seq{i}", species=rnd.choice(["Homo sapiens", "Mus musculus"]),
+                   specimen_voucher=f"ZSM {i}", sequence=sequences[i % 1000],
+                   quality_score_identifier="+", quality_score="I" * length)
+            for i in range(count)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--records', type=int, default=1_000_000)
+    parser.add_argument('--length', type=int, default=100)
+    args = parser.parse_args()
+
+    records = generate_records(args.records, args.length)
+    warnings.simplefilter('ignore')
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'output')
+        for name in WRITERS:
+            start = time.perf_counter()
+            with open(path, mode='w') as file:
+                writer = getattr(fasta, name).write(file, FIELDS)
+                next(writer)
+                for record in records:
+                    writer.send(record)
+                writer.close()
+            elapsed = time.perf_counter() - start
+            print(f"{name:>17}: {args.records / elapsed:10.0f} records/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Seeded generators of synthetic input files for the benchmarks
+
+Each generator writes the given number of records in one of the input formats.
+The same seed gives the same file, so the runs on different versions can be compared
+"""
+
+import random
+from typing import Callable, Dict, List, TextIO
+
+
+GENERA = ['Mantidactylus', 'Boophis', 'Gephyromantis', 'Heterixalus', 'Platypelis', 'Stumpffia']
+EPITHETS = ['femoralis', 'madagascariensis', 'luteus', 'sp. Ca12', 'aff. granulatus', 'cf. boulengeri']
+COUNTRIES = ['Madagascar', 'Comoros', 'Mauritius', 'Reunion', 'Mayotte']
+REGIONS = ['Fianarantsoa', 'Toamasina', 'Antsiranana', 'Mahajanga', 'Toliara']
+LOCALITIES = ['Ranomafana', 'Andasibe', 'Montagne d\'Ambre', 'Nosy Be', 'Marojejy', 'Tsaratanana']
+VOUCHER_PREFIXES = ['ZSM', 'FGZC', 'UADBA', 'MRSN', 'ZCMV']
+COLLECTORS = ['F. Glaw', 'M. Vences', 'D. R. Vieites', 'J. Kohler', 'A. Crottini']
+TISSUES = ['muscle', 'liver', 'toe clip', 'tail tip']
+SEXES = ['male', 'female', 'juvenile', 'unknown']
+
+# the columns of the generated tab files, besides seqid and sequence
+TAB_COLUMNS = ['species', 'specimen_voucher', 'isolate', 'country', 'region', 'locality', 'latitude', 'longitude',
+               'altitude', 'collection_date', 'collected_by', 'identified_by', 'sex', 'life_stage', 'tissue', 'notes']
+
+# the buffer size of the generated files
+_BUFFER_SIZE = 1 << 20
+
+
+class _Specimen:
+    """Random metadata of one specimen"""
+
+    def __init__(self, rnd: random.Random, i: int):
+        self.species = f"{rnd.choice(GENERA)} {rnd.choice(EPITHETS)}"
+        self.voucher = f"{rnd.choice(VOUCHER_PREFIXES)} {rnd.randrange(100000)}"
+        self.isolate = f"iso{i}"
+        self.country = rnd.choice(COUNTRIES)
+        self.region = rnd.choice(REGIONS)
+        self.locality = rnd.choice(LOCALITIES)
+        self.latitude = f"{rnd.uniform(-25.6, -11.9):.5f}"
+        self.longitude = f"{rnd.uniform(43.2, 50.5):.5f}"
+        self.altitude = str(rnd.randrange(2800))
+        self.date = f"{rnd.randrange(1990, 2024)}-{rnd.randrange(1, 13):02}-{rnd.randrange(1, 29):02}"
+        self.collector = rnd.choice(COLLECTORS)
+        self.identifier = rnd.choice(COLLECTORS)
+        self.sex = rnd.choice(SEXES)
+        self.tissue = rnd.choice(TISSUES)
+
+
+def _sequence(rnd: random.Random, length: int) -> str:
+    return "".join(rnd.choices("ACGT", k=length))
+
+
+def generate_fasta(file: TextIO, records: int, length: int, rnd: random.Random) -> None:
+    """Multi-line FASTA, 60 bases per line"""
+    for i in range(records):
+        sequence = _sequence(rnd, length)
+        file.write(f">seq{i}_{rnd.choice(GENERA)}_{rnd.choice(VOUCHER_PREFIXES)}{rnd.randrange(100000)}\n")
+        for j in range(0, length, 60):
+            file.write(sequence[j:j + 60] + "\n")
+
+
+def generate_fastq(file: TextIO, records: int, length: int, rnd: random.Random) -> None:
+    """FastQ in the style of Illumina, the quality scores can start with '@'"""
+    for i in range(records):
+        sequence = _sequence(rnd, length)
+        quality_score = "".join(rnd.choices("@ABCDEFGHI#", k=length))
+        file.write(f"@M00123:45:000000000-A1B2C:1:{1101 + i % 1000}:{10000 + i % 20000}:{i} 1:N:0:1\n{sequence}\n+\n{quality_score}\n")
+
+
+def generate_genbank(file: TextIO, records: int, length: int, rnd: random.Random) -> None:
+    """GenBank submission FASTA with many bracketed attributes"""
+    for i in range(records):
+        s = _Specimen(rnd, i)
+        file.write(f">seq{i} [organism={s.species}] [specimen-voucher={s.voucher}] [isolate={s.isolate}]"
+                   f" [country={s.country}: {s.region}, {s.locality}] [lat-lon={s.latitude.lstrip('-')} S {s.longitude} E]"
+                   f" [altitude={s.altitude} m] [collection-date={s.date}] [collected-by={s.collector}]"
+                   f" [identified-by={s.identifier}] [sex={s.sex}] [tissue-type={s.tissue}] [mol-type=genomic DNA]"
+                   f" [note=synthetic record {i}]\n{_sequence(rnd, length)}\n")
+
+
+def generate_moid(file: TextIO, records: int, length: int, rnd: random.Random) -> None:
+    """MoID FASTA, the identifier is the voucher and the species"""
+    for i in range(records):
+        s = _Specimen(rnd, i)
+        file.write(f">{s.voucher.replace(' ', '')}|{s.species.replace(' ', '_')}\n{_sequence(rnd, length)}\n")
+
+
+def generate_tab(file: TextIO, records: int, length: int, rnd: random.Random) -> None:
+    """Tab-separated table with many metadata columns"""
+    file.write("\t".join(['seqid', *TAB_COLUMNS, 'sequence']) + "\n")
+    for i in range(records):
+        s = _Specimen(rnd, i)
+        values: List[str] = [f"seq{i}", s.species, s.voucher, s.isolate, s.country, s.region, s.locality,
+                             s.latitude, s.longitude, s.altitude, s.date, s.collector, s.identifier, s.sex,
+                             'adult' if s.sex != 'juvenile' else 'juvenile', s.tissue, f"synthetic record {i}",
+                             _sequence(rnd, length)]
+        file.write("\t".join(values) + "\n")
+
+
+# the generators by the name of the input format, as accepted by parse_format
+GENERATORS: Dict[str, Callable[[TextIO, int, int, random.Random], None]] = {
+    'fasta': generate_fasta,
+    'fastq': generate_fastq,
+    'fasta_gbexport': generate_genbank,
+    'moid_fas': generate_moid,
+    'tab': generate_tab,
+}
+
+
+def generate_file(path: str, format_name: str, records: int, length: int = 200, seed: int = 0) -> None:
+    """Writes the file with the given number of records in the format"""
+    rnd = random.Random(seed)
+    with open(path, mode='w', buffering=_BUFFER_SIZE) as file:
+        GENERATORS[format_name](file, records, length, rnd)
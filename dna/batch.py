@@ -0,0 +1,271 @@
+from dataclasses import dataclass, field
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, TextIO
+import os
+import shutil
+import tempfile
+import threading
+import warnings
+
+from dna.library.profiling import profiled
+from dna.library.utils import renaming_disabled
+from dna.resultcache import ResultCache, hash_file, hash_text_file
+from dna.sniff import SNIFF_PREFIX_SIZE, format_mismatch, format_scores, sniff_file, sniff_text
+
+# the executor shared by the batches of all the requests, created by the first batch and after it breaks
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor(workers: Optional[int]) -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=workers)
+        return _executor
+
+
+def _drop_executor(executor: ProcessPoolExecutor) -> None:
+    """Forgets the broken executor, the next batch creates a new one"""
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+
+
+def paste_convert(inputdata: TextIO, outfile_path: str, informat_name: Optional[str] = None, outformat_name: Optional[str] = None, disable_automatic_renaming: bool = False, allow_empty_sequences: bool = False, cache: Optional[ResultCache] = None, profile: bool = False, pstats_path: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Converts the pasted text into the file at outfile_path
+
+    Raises ValueError without converting, if the text is clearly not in the format informat_name.
+    If the cache is given, a repeated conversion of the same text is copied from it.
+    If profile is True, returns the report of the conversion, see dna.library.profiling.ConversionProfile,
+    and if pstats_path is given, the cProfile statistics are saved there
+    """
+    if inputdata.seekable():
+        mismatch = format_mismatch(sniff_text(inputdata.read(SNIFF_PREFIX_SIZE + 1)), informat_name)
+        inputdata.seek(0)
+        if mismatch:
+            raise ValueError(mismatch)
+    else:
+        # the text can be read only once
+        cache = None
+    # the cache works with directories of outputs
+    cache_dir = os.path.dirname(outfile_path) or None
+    if cache:
+        key = ResultCache.key(hash_text_file(inputdata), informat_name, outformat_name,
+                              allow_empty_sequences, disable_automatic_renaming)
+        inputdata.seek(0)
+        with tempfile.TemporaryDirectory(dir=cache_dir) as cached_dir:
+            cached_warnings = cache.lookup(key, cached_dir)
+            if cached_warnings is not None:
+                inputdata.close()
+                os.replace(os.path.join(cached_dir, 'output'), outfile_path)
+                for warning in cached_warnings:
+                    warnings.warn(warning)
+                return None
+    # the converter loads all the formats, it's imported by the first conversion, not when the server starts
+    from dna.DNAconvert import convertDNA, parse_format
+    informat = parse_format(informat_name, ext_pair=("", ""))
+    outformat = parse_format(outformat_name, ext_pair=("", ""))
+    infile = inputdata
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always', UserWarning)
+        with infile, open(outfile_path, mode="w") as outfile, profiled(profile, pstats_path) as conversion_profile, \
+                renaming_disabled(disable_automatic_renaming):
+            convertDNA(infile, outfile, informat=informat, outformat=outformat, allow_empty_sequences=allow_empty_sequences, disable_automatic_renaming=disable_automatic_renaming)
+    if cache:
+        with tempfile.TemporaryDirectory(dir=cache_dir) as cached_dir:
+            shutil.copyfile(outfile_path, os.path.join(cached_dir, 'output'))
+            cache.store(key, cached_dir, [str(warning.message) for warning in caught])
+    # the warnings are passed on to the caller
+    for warning in caught:
+        warnings.warn_explicit(warning.message, warning.category, warning.filename, warning.lineno)
+    return conversion_profile.report() if conversion_profile else None
+
+
+@dataclass
+class FileResult():
+    """The outcome of the conversion of one file in a batch"""
+    filename: str
+    error: Optional[str] = None
+    warnings: List[str] = field(default_factory=list)
+    # the report of the profiled conversion, see dna.library.profiling.ConversionProfile
+    profile: Optional[Dict[str, Any]] = None
+
+
+def _convert_directory(input_dir: str, output_dir: str, filename: str, informat_name: Optional[str], outformat_name: Optional[str], allow_empty_sequences: bool, disable_automatic_renaming: bool, profile: bool, pstats_dir: Optional[str]) -> FileResult:
+    """
+    Converts input_dir, which contains only the file filename, with convert_wrapper into the empty output_dir
+
+    convert_wrapper is given a directory with only this file,
+    so the output names are the same as for the whole directory.
+    The errors and warnings are collected in the returned FileResult instead of being raised
+    """
+    from dna.DNAconvert import convert_wrapper
+    result = FileResult(filename)
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always', UserWarning)
+        pstats_path = os.path.join(pstats_dir, filename + '.pstats') if pstats_dir else None
+        with profiled(profile, pstats_path) as conversion_profile, renaming_disabled(disable_automatic_renaming):
+            try:
+                convert_wrapper(
+                    input_dir,
+                    output_dir,
+                    informat_name,
+                    outformat_name,
+                    allow_empty_sequences=allow_empty_sequences,
+                    disable_automatic_renaming=disable_automatic_renaming,
+                )
+            except Exception as e:
+                result.error = str(e)
+        if conversion_profile:
+            result.profile = conversion_profile.report()
+    result.warnings = [str(warning.message) for warning in caught]
+    return result
+
+
+def _move_outputs(source_dir: str, output_dir: str) -> None:
+    for output_name in os.listdir(source_dir):
+        shutil.move(os.path.join(source_dir, output_name),
+                    os.path.join(output_dir, output_name))
+
+
+def convert_file(input_path: str, output_dir: str, informat_name: Optional[str], outformat_name: Optional[str], allow_empty_sequences: bool = False, disable_automatic_renaming: bool = False, cache: Optional[ResultCache] = None, profile: bool = False, pstats_dir: Optional[str] = None) -> FileResult:
+    """
+    Converts one file with convert_wrapper and moves the outputs into output_dir
+
+    The errors and warnings are collected in the returned FileResult instead of being raised.
+    If the cache is given, a repeated conversion of the same file is copied from it.
+    If profile is True, the report of the conversion is stored in the FileResult,
+    and if pstats_dir is given, the cProfile statistics are saved there as the filename with .pstats
+    """
+    filename = os.path.basename(input_path)
+    if cache:
+        # the names of the outputs are derived from the filename
+        key = ResultCache.key(hash_file(input_path), informat_name, outformat_name,
+                              allow_empty_sequences, disable_automatic_renaming, filename)
+        cached_warnings = cache.lookup(key, output_dir)
+        if cached_warnings is not None:
+            return FileResult(filename, warnings=cached_warnings)
+    with tempfile.TemporaryDirectory() as workdir:
+        input_dir = os.path.join(workdir, 'input')
+        file_output_dir = os.path.join(workdir, 'output')
+        os.mkdir(input_dir)
+        os.mkdir(file_output_dir)
+        try:
+            os.link(input_path, os.path.join(input_dir, filename))
+        except OSError:
+            # hard links are not possible across file systems
+            shutil.copyfile(input_path, os.path.join(input_dir, filename))
+
+        result = _convert_directory(input_dir, file_output_dir, filename, informat_name, outformat_name,
+                                    allow_empty_sequences, disable_automatic_renaming, profile, pstats_dir)
+        # only the outputs of successful conversions are kept
+        if result.error is None:
+            if cache:
+                cache.store(key, file_output_dir, result.warnings)
+            _move_outputs(file_output_dir, output_dir)
+    return result
+
+
+def convert_stream(infile: BinaryIO, filename: str, output_dir: str, informat_name: Optional[str], outformat_name: Optional[str], allow_empty_sequences: bool = False, disable_automatic_renaming: bool = False, profile: bool = False, pstats_dir: Optional[str] = None) -> FileResult:
+    """
+    Converts one file, that is read from the unseekable binary infile, into output_dir
+
+    infile.peek(size) should return the next size bytes without consuming them, or all the remaining ones.
+    The file is converted by convert_wrapper, as in convert_file, so the outputs have the same names.
+    convert_wrapper needs a regular file, so infile is copied into a private temporary directory,
+    not into the workspace, and removed after the conversion.
+    The errors and warnings, including the errors of reading infile, are collected in the returned FileResult.
+    profile and pstats_dir are the same as in convert_file
+    """
+    prefix = infile.peek(SNIFF_PREFIX_SIZE)
+    scores = format_scores(prefix.decode('utf-8', errors='replace'), len(prefix) < SNIFF_PREFIX_SIZE)
+    mismatch = format_mismatch(scores, informat_name)
+    if mismatch:
+        return FileResult(filename, error=mismatch)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        input_dir = os.path.join(workdir, 'input')
+        file_output_dir = os.path.join(workdir, 'output')
+        os.mkdir(input_dir)
+        os.mkdir(file_output_dir)
+        try:
+            with open(os.path.join(input_dir, filename), mode='wb') as input_file:
+                shutil.copyfileobj(infile, input_file)
+        except Exception as e:
+            # the output of an incomplete file is not kept
+            return FileResult(filename, error=str(e))
+        result = _convert_directory(input_dir, file_output_dir, filename, informat_name, outformat_name,
+                                    allow_empty_sequences, disable_automatic_renaming, profile, pstats_dir)
+        # only the outputs of successful conversions are kept
+        if result.error is None:
+            _move_outputs(file_output_dir, output_dir)
+    return result
+
+
+def convert_batch(input_dir: str, output_dir: str, informat_name: Optional[str], outformat_name: Optional[str], allow_empty_sequences: bool = False, disable_automatic_renaming: bool = False, workers: Optional[int] = None, on_result: Optional[Callable[[FileResult], None]] = None, cache: Optional[ResultCache] = None, profile: bool = False, pstats_dir: Optional[str] = None) -> List[FileResult]:
+    """
+    Converts every file in input_dir into output_dir, each file independently
+
+    workers is the number of processes, None means the number of CPUs.
+    The processes are shared by all the batches, so concurrent batches don't multiply them,
+    their number is set by the first batch.
+    With one worker the files are converted in the current process.
+    on_result is called with the result of each file as soon as it is converted.
+    cache is the ResultCache of the previous conversions or None.
+    profile and pstats_dir are the same as in convert_file.
+    The files that are clearly not in the format informat_name are not converted.
+    A file whose process has died gets an error, the other files are converted.
+    Returns the results in the order of the file names
+    """
+    input_paths = [os.path.join(input_dir, filename)
+                   for filename in sorted(os.listdir(input_dir))]
+    options = (output_dir, informat_name, outformat_name,
+               allow_empty_sequences, disable_automatic_renaming, cache, profile, pstats_dir)
+
+    # the conversions that would fail on the wrong format are not started
+    results: Dict[str, FileResult] = {}
+    for input_path in input_paths:
+        mismatch = format_mismatch(sniff_file(input_path), informat_name)
+        if mismatch:
+            results[input_path] = FileResult(os.path.basename(input_path), error=mismatch)
+            if on_result:
+                on_result(results[input_path])
+    pending_paths = [input_path for input_path in input_paths if input_path not in results]
+
+    if workers == 1 or len(pending_paths) <= 1:
+        for input_path in pending_paths:
+            results[input_path] = convert_file(input_path, *options)
+            if on_result:
+                on_result(results[input_path])
+        return [results[input_path] for input_path in input_paths]
+
+    for attempt in range(2):
+        executor = _get_executor(workers)
+        try:
+            futures = {executor.submit(convert_file, input_path, *options): input_path
+                       for input_path in pending_paths}
+        except RuntimeError:
+            # BrokenProcessPool is a RuntimeError, as is the submission after the shutdown
+            if attempt:
+                raise
+            _drop_executor(executor)
+        else:
+            break
+    for future in as_completed(futures):
+        input_path = futures[future]
+        try:
+            results[input_path] = future.result()
+        except BrokenProcessPool:
+            # a process killed by the system breaks the executor for all its files
+            _drop_executor(executor)
+            results[input_path] = FileResult(os.path.basename(input_path),
+                                             error="the conversion process has stopped unexpectedly, the file may be too large")
+        except Exception as e:
+            results[input_path] = FileResult(os.path.basename(input_path), error=str(e))
+        if on_result:
+            on_result(results[input_path])
+    return [results[input_path] for input_path in input_paths]
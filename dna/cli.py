@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Converts a file between the sequence formats, without the web interface
+
+The files are converted by DNAconvert with the same options as in the web app.
+With --workers, the parts of a large file in the formats of dna.library.formats are converted in parallel.
+Neither Flask nor the other web dependencies are imported.
+Run: python -m dna.cli input output --to fasta [--from fastq] [--workers 4]
+"""
+
+from typing import List, Optional
+import argparse
+import functools
+import sys
+import warnings
+
+from dna.library import utils
+from dna.library.formats import format_names, get_format
+
+
+def convert(input_path: str, output_path: str, informat_name: str, outformat_name: str, workers: Optional[int] = 1, allow_empty_sequences: bool = False, disable_automatic_renaming: bool = False) -> None:
+    """
+    Converts the file at input_path into output_path with DNAconvert
+
+    If workers is not 1 and both formats are in dna.library.formats,
+    the parts of the file are converted by DNAconvert in parallel, workers None means the number of CPUs
+    """
+    # the converter loads all the formats, it's imported when a file is converted, not when the command starts
+    from dna.DNAconvert import convertDNA, parse_format
+    converter = functools.partial(convertDNA, informat=parse_format(informat_name, ext_pair=("", "")),
+                                  outformat=parse_format(outformat_name, ext_pair=("", "")),
+                                  allow_empty_sequences=allow_empty_sequences, disable_automatic_renaming=disable_automatic_renaming)
+    names = format_names()
+    if workers != 1 and informat_name in names and outformat_name in names:
+        from dna.library.parallel import convert_parallel
+        with utils.renaming_disabled(disable_automatic_renaming):
+            convert_parallel(input_path, output_path, get_format(informat_name), get_format(outformat_name),
+                             workers=workers, converter=converter)
+        return
+    with open(input_path) as infile, open(output_path, mode='w') as outfile, utils.renaming_disabled(disable_automatic_renaming):
+        converter(infile, outfile)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m dna.cli', description=__doc__.splitlines()[1])
+    parser.add_argument('input', help="the input file, it can be compressed")
+    parser.add_argument('output', help="the output file")
+    parser.add_argument('--from', dest='informat', help="the input format, detected from the content by default")
+    parser.add_argument('--to', dest='outformat', required=True, help="the output format")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="the number of processes that convert the parts of a large file, 0 means the number of CPUs")
+    parser.add_argument('--allow-empty-sequences', action='store_true')
+    parser.add_argument('--disable-automatic-renaming', action='store_true')
+    args = parser.parse_args(argv)
+
+    # the warnings are shown as plain messages
+    warnings.showwarning = lambda message, *_: print(f"Warning: {message}", file=sys.stderr)
+    try:
+        informat_name = args.informat
+        if informat_name is None:
+            from dna.sniff import best_format, sniff_file
+            informat_name, _ = best_format(sniff_file(args.input))
+            if informat_name is None:
+                parser.error(f"the format of {args.input} cannot be detected, use --from")
+        convert(args.input, args.output, informat_name, args.outformat, workers=args.workers or None,
+                allow_empty_sequences=args.allow_empty_sequences, disable_automatic_renaming=args.disable_automatic_renaming)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,298 @@
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional, Tuple
+import functools
+import json
+import os
+import threading
+import time
+import warnings
+
+from dna.batch import FileResult, convert_batch, paste_convert
+from dna.metrics import record_conversion, registry
+from dna.resultcache import ResultCache
+from dna.workspace import WORKSPACE_TOUCH_INTERVAL, Workspace
+
+
+# the executor that runs the background jobs, created on the first submission and after it breaks
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+# the number of times a job that hasn't started is submitted again, when its executor breaks
+JOB_RESUBMISSIONS = 2
+
+# the workspaces of the submitted jobs that haven't ended by the path, they are touched, so they don't expire in the queue
+_held_workspaces: Dict[str, Workspace] = {}
+_held_lock = threading.Lock()
+_toucher: Optional[threading.Thread] = None
+
+
+def _get_executor(workers: Optional[int]) -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=workers)
+        return _executor
+
+
+def _drop_executor(executor: ProcessPoolExecutor) -> None:
+    """Forgets the broken executor, the next submission creates a new one"""
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+
+
+def _touch_held_workspaces() -> None:
+    while True:
+        time.sleep(WORKSPACE_TOUCH_INTERVAL)
+        with _held_lock:
+            paths = list(_held_workspaces)
+        for path in paths:
+            try:
+                os.utime(path)
+            except OSError:
+                # removed by the user
+                pass
+
+
+def _hold(workspace: Workspace) -> None:
+    """Keeps the workspace from expiring until it's released, one thread touches all the held workspaces"""
+    global _toucher
+    with _held_lock:
+        _held_workspaces[workspace.path] = workspace
+        if _toucher is None:
+            _toucher = threading.Thread(target=_touch_held_workspaces, name='job-workspaces', daemon=True)
+            _toucher.start()
+
+
+def _release(workspace: Workspace) -> None:
+    with _held_lock:
+        _held_workspaces.pop(workspace.path, None)
+
+
+def _write_status(workspace: Workspace, status: Dict[str, Any]) -> None:
+    """
+    Replaces the status file of the job atomically
+    """
+    temp_path = workspace.status_file + f'.{os.getpid()}.tmp'
+    with open(temp_path, mode='w') as status_file:
+        json.dump(status, status_file)
+    os.replace(temp_path, workspace.status_file)
+
+
+def read_status(workspace: Workspace) -> Optional[Dict[str, Any]]:
+    """
+    Returns the status of the job in the workspace or None, if the workspace has no job
+
+    The status is a dictionary with the keys:
+        state: one of 'queued', 'running', 'done', 'failed'
+        files_total, files_done: the number of the converted files
+        bytes_written: the size of the outputs written so far
+        warnings: the list of the warnings
+        error: the reason of the failure or None
+        profiles: the profiling reports of the converted files by the filename, if the job is profiled,
+            see dna.library.profiling.ConversionProfile
+    """
+    try:
+        with open(workspace.status_file) as status_file:
+            status = json.load(status_file)
+    except (OSError, ValueError):
+        return None
+    # the outputs are measured, instead of reported by the worker
+    if os.path.isdir(workspace.result_dir):
+        status['bytes_written'] = sum(entry.stat().st_size for entry in os.scandir(workspace.result_dir) if entry.is_file())
+    elif os.path.exists(workspace.result_file):
+        status['bytes_written'] = os.path.getsize(workspace.result_file)
+    else:
+        status['bytes_written'] = 0
+    return status
+
+
+def count_jobs(root: str) -> Dict[str, int]:
+    """
+    Returns the number of the jobs in the workspaces under root by their state
+
+    The workspaces are not touched, so counting doesn't extend their time to live
+    """
+    counts = dict.fromkeys(['queued', 'running', 'done', 'failed'], 0)
+    if not os.path.isdir(root):
+        return counts
+    for job_id in os.listdir(root):
+        try:
+            with open(Workspace(root, job_id).status_file) as status_file:
+                state = json.load(status_file)['state']
+        except (OSError, ValueError, KeyError):
+            # not a workspace or not a job
+            continue
+        counts[state] = counts.get(state, 0) + 1
+    return counts
+
+
+def _new_status(files_total: int) -> Dict[str, Any]:
+    return {'state': 'queued', 'files_total': files_total, 'files_done': 0, 'warnings': [], 'error': None}
+
+
+def _directory_size(path: str) -> int:
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+
+def _record_job(metrics_formats: Tuple[Optional[str], Optional[str]], seconds: float, input_bytes: int, output_bytes: int, error: bool, file_errors: int = 0) -> None:
+    """Records the conversion of the job and saves the metrics, since the worker processes don't exit normally"""
+    record_conversion(*metrics_formats, seconds, input_bytes, output_bytes, error=error, file_errors=file_errors)
+    registry.save()
+
+
+def _run_upload_job(root: str, job_id: str, informat_name: str, outformat_name: str, options: Dict[str, bool], cache: Optional[ResultCache], profile: bool, pstats_dir: Optional[str], metrics_formats: Tuple[Optional[str], Optional[str]]) -> None:
+    """
+    Converts the uploaded files of the job one after another, runs in a worker process
+    """
+    workspace = Workspace(root, job_id)
+    status = _new_status(len(os.listdir(workspace.input_dir)))
+    status['state'] = 'running'
+    if profile:
+        status['profiles'] = {}
+    _write_status(workspace, status)
+
+    def on_result(file_result: FileResult) -> None:
+        status['files_done'] += 1
+        if file_result.profile:
+            status['profiles'][file_result.filename] = file_result.profile
+        status['warnings'].extend(f'{file_result.filename}: {warning}' for warning in file_result.warnings)
+        if file_result.error:
+            status['warnings'].append(f'{file_result.filename} could not be converted: {file_result.error}')
+        _write_status(workspace, status)
+
+    conversion_start = time.perf_counter()
+    file_errors = 0
+    try:
+        file_results = convert_batch(workspace.input_dir, workspace.result_dir, informat_name, outformat_name,
+                                     workers=1, on_result=on_result, cache=cache,
+                                     profile=profile, pstats_dir=pstats_dir, **options)
+    except Exception as e:
+        status['state'] = 'failed'
+        status['error'] = str(e)
+    else:
+        file_errors = sum(1 for file_result in file_results if file_result.error)
+        if file_results and file_errors == len(file_results):
+            status['state'] = 'failed'
+            status['error'] = 'none of the files could be converted'
+        else:
+            status['state'] = 'done'
+    _write_status(workspace, status)
+    _record_job(metrics_formats, time.perf_counter() - conversion_start, _directory_size(workspace.input_dir),
+                _directory_size(workspace.result_dir), error=status['state'] == 'failed', file_errors=file_errors)
+
+
+def _run_paste_job(root: str, job_id: str, informat_name: str, outformat_name: str, options: Dict[str, bool], cache: Optional[ResultCache], profile: bool, pstats_dir: Optional[str], metrics_formats: Tuple[Optional[str], Optional[str]]) -> None:
+    """
+    Converts the pasted text of the job, runs in a worker process
+    """
+    workspace = Workspace(root, job_id)
+    status = _new_status(1)
+    status['state'] = 'running'
+    _write_status(workspace, status)
+
+    conversion_start = time.perf_counter()
+    # the worker process runs one job at a time, so the warnings can be caught
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always', UserWarning)
+        try:
+            with open(workspace.input_file) as input_file:
+                report = paste_convert(input_file, workspace.result_file,
+                                       informat_name=informat_name, outformat_name=outformat_name, cache=cache, profile=profile,
+                                       pstats_path=os.path.join(pstats_dir, 'paste.pstats') if pstats_dir else None, **options)
+        except Exception as e:
+            status['state'] = 'failed'
+            status['error'] = str(e)
+        else:
+            status['state'] = 'done'
+            status['files_done'] = 1
+            if report:
+                status['profiles'] = {'paste': report}
+    status['warnings'] = [str(warning.message) for warning in caught]
+    _write_status(workspace, status)
+    failed = status['state'] == 'failed'
+    _record_job(metrics_formats, time.perf_counter() - conversion_start, os.path.getsize(workspace.input_file),
+                0 if failed else os.path.getsize(workspace.result_file), error=failed)
+
+
+def _submit(workspace: Workspace, job_workers: Optional[int], run: Callable[..., None], args: Tuple, resubmissions: int = JOB_RESUBMISSIONS) -> None:
+    """
+    Runs run(workspace.root, workspace.job_id, *args) in the executor
+
+    The executor is replaced, if it's broken by a worker that died or has been shut down.
+    The workspace is held from the submission until the job ends, so it doesn't expire in the queue
+    """
+    _hold(workspace)
+    for attempt in range(2):
+        executor = _get_executor(job_workers)
+        try:
+            future = executor.submit(run, workspace.root, workspace.job_id, *args)
+        except RuntimeError:
+            # BrokenProcessPool is a RuntimeError, as is the submission after the shutdown
+            if attempt:
+                _release(workspace)
+                raise
+            _drop_executor(executor)
+        else:
+            break
+    future.add_done_callback(functools.partial(_job_done, workspace, job_workers, run, args, resubmissions))
+
+
+def _job_done(workspace: Workspace, job_workers: Optional[int], run: Callable[..., None], args: Tuple, resubmissions: int, future: Future) -> None:
+    """
+    Marks the job as failed, if it ended without writing its final status, and releases its workspace
+
+    The jobs that haven't started when their executor broke are submitted again
+    """
+    if future.cancelled():
+        error: Optional[BaseException] = RuntimeError("the job has been cancelled")
+    else:
+        error = future.exception()
+    if error is None:
+        _release(workspace)
+        return
+    status = read_status(workspace) or _new_status(0)
+    if isinstance(error, BrokenProcessPool) and status['state'] == 'queued' and resubmissions:
+        _submit(workspace, job_workers, run, args, resubmissions - 1)
+        return
+    _release(workspace)
+    if status['state'] not in ('queued', 'running'):
+        return
+    if isinstance(error, BrokenProcessPool):
+        error = RuntimeError("the conversion process has stopped unexpectedly, the input may be too large")
+    status['state'] = 'failed'
+    status['error'] = str(error)
+    _write_status(workspace, status)
+
+
+def submit_upload_job(workspace: Workspace, informat_name: str, outformat_name: str, options: Dict[str, bool], job_workers: Optional[int] = None, cache: Optional[ResultCache] = None, profile: bool = False, pstats_dir: Optional[str] = None, metrics_formats: Optional[Tuple[Optional[str], Optional[str]]] = None) -> None:
+    """
+    Starts the conversion of the files in workspace.input_dir in the background
+
+    job_workers is the number of jobs that run at the same time, None means the number of CPUs.
+    The files of a job are converted one after another in its worker process, so the processes of the jobs
+    are the only processes of the background conversions.
+    cache is the ResultCache of the previous conversions or None,
+    profile and pstats_dir are the same as in dna.batch.convert_batch,
+    metrics_formats are the labels of the formats in the conversion metrics, the format names by default
+    """
+    os.makedirs(workspace.result_dir, exist_ok=True)
+    _write_status(workspace, _new_status(len(os.listdir(workspace.input_dir))))
+    _submit(workspace, job_workers, _run_upload_job, (informat_name, outformat_name, options, cache, profile, pstats_dir,
+                                                      metrics_formats or (informat_name, outformat_name)))
+
+
+def submit_paste_job(workspace: Workspace, informat_name: str, outformat_name: str, options: Dict[str, bool], job_workers: Optional[int] = None, cache: Optional[ResultCache] = None, profile: bool = False, pstats_dir: Optional[str] = None, metrics_formats: Optional[Tuple[Optional[str], Optional[str]]] = None) -> None:
+    """
+    Starts the conversion of workspace.input_file in the background
+
+    job_workers is the number of jobs that run at the same time, None means the number of CPUs,
+    cache is the ResultCache of the previous conversions or None,
+    if profile is True, the status contains the profiling report as the file 'paste',
+    and if pstats_dir is given, the cProfile statistics are saved there as paste.pstats,
+    metrics_formats are the same as in submit_upload_job
+    """
+    _write_status(workspace, _new_status(1))
+    _submit(workspace, job_workers, _run_paste_job, (informat_name, outformat_name, options, cache, profile, pstats_dir,
+                                                     metrics_formats or (informat_name, outformat_name)))
@@ -0,0 +1,155 @@
+from array import array
+from typing import Any, Dict, Iterator, List
+from .record import *
+
+# the default number of records in a batch
+RECORD_BATCH_SIZE = 4096
+
+
+class RecordBatch:
+    """
+    Holds a batch of records column-wise
+
+    The fields except 'sequence' are stored as lists of values,
+    the sequences are concatenated in one string and located by offsets.
+    A column is created when its field gets the first value,
+    the fields without a column have the value "".
+
+    row(i) and rows() give views that support the item access of Record,
+    records() creates Record objects for the code that needs them
+    """
+
+    def __init__(self, fields: List[str]):
+        self.fields = fields
+        self._columns: Dict[str, List[str]] = {}
+        self._length = 0
+        # the sequences that are not yet concatenated into the buffer
+        self._pieces: List[str] = []
+        self._buffer = ""
+        self._offsets = array('q', [0])
+        # the end of the last sequence
+        self._end = 0
+        # the sequences changed through the row views
+        self._changed_sequences: Dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return self._length
+
+    def append(self, sequence: str, **values: str) -> None:
+        """Appends a record to the batch"""
+        columns = self._columns
+        length = self._length
+        for field, value in values.items():
+            column = columns.get(field)
+            if column is None:
+                # the earlier records didn't have this field
+                column = columns[field] = [""] * length
+            column.append(value)
+        self._length = length + 1
+        # fill the columns of the fields that this record doesn't have
+        if len(values) < len(columns):
+            for column in columns.values():
+                if len(column) == length:
+                    column.append("")
+        self._pieces.append(sequence)
+        self._end += len(sequence)
+        self._offsets.append(self._end)
+
+    def column(self, field: str) -> List[str]:
+        """Returns the values of the field in all records"""
+        if field == 'sequence':
+            self._concatenate()
+            buffer = self._buffer
+            offsets = self._offsets
+            sequences = [buffer[offsets[i]:offsets[i + 1]] for i in range(self._length)]
+            for i, sequence in self._changed_sequences.items():
+                sequences[i] = sequence
+            return sequences
+        try:
+            return self._columns[field]
+        except KeyError:
+            if field not in self.fields:
+                raise
+            return [""] * self._length
+
+    def value(self, field: str, i: int) -> str:
+        """Returns the value of the field in the i-th record"""
+        column = self._columns.get(field)
+        if column is not None:
+            return column[i]
+        if field == 'sequence':
+            return self.sequence(i)
+        if field not in self.fields:
+            raise KeyError(field)
+        return ""
+
+    def set_value(self, field: str, i: int, value: str) -> None:
+        """Changes the value of the field in the i-th record"""
+        if field == 'sequence':
+            self._changed_sequences[i] = value
+            return
+        if field not in self._columns:
+            self._columns[field] = [""] * self._length
+        self._columns[field][i] = value
+
+    def _concatenate(self) -> None:
+        """Moves the appended sequences into the buffer"""
+        if self._pieces:
+            self._buffer = "".join([self._buffer] + self._pieces)
+            self._pieces = []
+
+    def sequence(self, i: int) -> str:
+        """Returns the sequence of the i-th record"""
+        if self._changed_sequences and i in self._changed_sequences:
+            return self._changed_sequences[i]
+        if self._pieces:
+            self._concatenate()
+        return self._buffer[self._offsets[i]:self._offsets[i + 1]]
+
+    def row(self, i: int) -> 'RowView':
+        """Returns a view of the i-th record"""
+        return RowView(self, i)
+
+    def rows(self) -> Iterator['RowView']:
+        """Returns iterator over views of the records"""
+        for i in range(self._length):
+            yield RowView(self, i)
+
+    def records(self) -> Iterator[Record]:
+        """Returns iterator over the records as Record objects"""
+        self._concatenate()
+        buffer = self._buffer
+        offsets = self._offsets
+        names = list(self._columns)
+        defaults = {field: "" for field in self.fields
+                    if field != 'sequence' and field not in self._columns}
+        for i, values in enumerate(zip(*self._columns.values()) if names else ((),) * self._length):
+            fields = dict(zip(names, values))
+            fields['sequence'] = self._changed_sequences[i] if i in self._changed_sequences else buffer[offsets[i]:offsets[i + 1]]
+            if defaults:
+                fields.update(defaults)
+            yield Record(**fields)
+
+
+class RowView:
+    """
+    A record of a RecordBatch, supports the item access of Record
+    """
+    __slots__ = ('_batch', '_index')
+
+    def __init__(self, batch: RecordBatch, index: int):
+        self._batch = batch
+        self._index = index
+
+    def __getitem__(self, field: str) -> str:
+        return self._batch.value(field, self._index)
+
+    def __setitem__(self, field: str, value: str) -> None:
+        self._batch.set_value(field, self._index, value)
+
+    def get(self, field: str, default: Any = None) -> Any:
+        try:
+            return self._batch.value(field, self._index)
+        except KeyError:
+            return default
+
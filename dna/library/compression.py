@@ -0,0 +1,225 @@
+from typing import Any, BinaryIO, Callable, Dict, Generator, IO, List, Optional, TextIO, Tuple
+import functools
+import importlib.util
+import io
+import queue
+import threading
+
+# the amount of decompressed bytes that the reader thread passes at once
+DECOMPRESSION_CHUNK_SIZE = 1 << 20
+# the maximal number of decompressed chunks that wait to be parsed
+DECOMPRESSION_QUEUE_SIZE = 8
+
+
+# the compression modules are imported when a compressed file is opened, most files are not compressed
+def _open_gzip(file: BinaryIO, mode: str) -> BinaryIO:
+    import gzip
+    return gzip.GzipFile(fileobj=file, mode=mode)
+
+
+def _open_bz2(file: BinaryIO, mode: str) -> BinaryIO:
+    import bz2
+    return bz2.BZ2File(file, mode=mode)
+
+
+def _open_xz(file: BinaryIO, mode: str) -> BinaryIO:
+    import lzma
+    return lzma.LZMAFile(file, mode=mode)
+
+
+def _open_zstd(file: BinaryIO, mode: str) -> BinaryIO:
+    from compression import zstd
+    return zstd.ZstdFile(file, mode=mode)
+
+
+# the functions that open a compressed stream over a binary file, by the name of the compression
+_openers: Dict[str, Callable[[BinaryIO, str], BinaryIO]] = {
+    'gzip': _open_gzip,
+    'bz2': _open_bz2,
+    'xz': _open_xz,
+}
+try:
+    # the standard library contains zstd since Python 3.14
+    if importlib.util.find_spec('compression.zstd'):
+        _openers['zstd'] = _open_zstd
+except ImportError:
+    pass
+
+# the supported compressions
+COMPRESSIONS = tuple(_openers)
+
+# the magic bytes at the start of the compressed files
+_magic_bytes: List[Tuple[bytes, str]] = [
+    (b'\x1f\x8b', 'gzip'),
+    (b'BZh', 'bz2'),
+    (b'\xfd7zXZ\x00', 'xz'),
+    (b'\x28\xb5\x2f\xfd', 'zstd'),
+]
+MAGIC_SIZE = max(len(magic) for magic, _ in _magic_bytes)
+
+
+def detect_compression(prefix: bytes) -> Optional[str]:
+    """
+    Returns the compression of the data starting with the prefix, or None if it's not compressed in a supported way
+    """
+    for magic, compression in _magic_bytes:
+        if prefix.startswith(magic) and compression in _openers:
+            return compression
+    return None
+
+
+def open_decompressed(file: BinaryIO, compression: str) -> BinaryIO:
+    """Returns the binary stream of the decompressed content of the file"""
+    return _openers[compression](file, 'rb')
+
+
+def _put(chunks: queue.Queue, cancelled: threading.Event, chunk: Any) -> bool:
+    """
+    Waits until the chunk is put into the queue.
+    Returns False if the reader was closed
+    """
+    while not cancelled.is_set():
+        try:
+            chunks.put(chunk, timeout=0.1)
+        except queue.Full:
+            continue
+        return True
+    return False
+
+
+def _read_chunks(source: BinaryIO, chunks: queue.Queue, cancelled: threading.Event) -> None:
+    """
+    Reads the source into the queue, runs in the reader thread
+
+    None marks the end of the source, an exception is passed to the reader
+    """
+    try:
+        with source:
+            while True:
+                chunk = source.read(DECOMPRESSION_CHUNK_SIZE)
+                if not _put(chunks, cancelled, chunk or None) or not chunk:
+                    return
+    except Exception as e:
+        _put(chunks, cancelled, e)
+
+
+class _ThreadedReader(io.RawIOBase):
+    """
+    Unseekable binary file, whose source is read in a separate thread
+
+    The decompression in the thread overlaps with the parsing of the already decompressed data
+    """
+
+    def __init__(self, source: BinaryIO):
+        self._chunks: queue.Queue = queue.Queue(maxsize=DECOMPRESSION_QUEUE_SIZE)
+        self._cancelled = threading.Event()
+        self._data = memoryview(b'')
+        self._eof = False
+        # the thread doesn't refer to the reader, so the reader can be collected and closed before the end
+        threading.Thread(target=_read_chunks, args=(source, self._chunks, self._cancelled), daemon=True).start()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b: Any) -> int:
+        while not self._data and not self._eof:
+            chunk = self._chunks.get()
+            if chunk is None:
+                self._eof = True
+            elif isinstance(chunk, Exception):
+                self._eof = True
+                raise chunk
+            else:
+                self._data = memoryview(chunk)
+        size = min(len(b), len(self._data))
+        b[:size] = self._data[:size]
+        self._data = self._data[size:]
+        return size
+
+    def close(self) -> None:
+        # stops the thread
+        self._cancelled.set()
+        super().close()
+
+
+def decompressed(file: IO) -> IO:
+    """
+    Returns the file, or its decompressed content if it starts with the magic bytes of a supported compression
+
+    Works on text and binary files that have not been read yet.
+    The compression is detected only on buffered files, that can be peeked into
+    """
+    buffer = getattr(file, 'buffer', None) if isinstance(file, io.TextIOBase) else file
+    if not hasattr(buffer, 'peek'):
+        return file
+    compression = detect_compression(buffer.peek(MAGIC_SIZE))
+    if compression is None:
+        return file
+    content = io.BufferedReader(_ThreadedReader(open_decompressed(buffer, compression)), DECOMPRESSION_CHUNK_SIZE)
+    if buffer is file:
+        return content
+    return io.TextIOWrapper(content, encoding=file.encoding, errors=file.errors)
+
+
+def decompressing_reader(read: Callable) -> Callable:
+    """
+    Decorator for the reader methods, that makes them read the compressed files transparently
+    """
+    @functools.wraps(read)
+    def wrapper(file: IO, *args: Any, **kwargs: Any) -> Any:
+        return read(decompressed(file), *args, **kwargs)
+    return wrapper
+
+
+class _UnseekableWriter(io.RawIOBase):
+    """
+    Binary file that writes into the target, but doesn't allow seeking
+
+    The compressed streams claim to be seekable, but can only seek forward
+    """
+
+    def __init__(self, target: BinaryIO):
+        self._target = target
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b: Any) -> int:
+        return self._target.write(b)
+
+
+def _compressed_writer(write: Callable[..., Generator], file: TextIO, fields: List[str], compression: str, args: Tuple, kwargs: Dict[str, Any]) -> Generator:
+    """
+    Runs the writer method write on the compressed stream over the file
+    """
+    # the text written before should precede the compressed content
+    file.flush()
+    compressor = _openers[compression](file.buffer, 'wb')
+    text = io.TextIOWrapper(io.BufferedWriter(_UnseekableWriter(compressor)), encoding=file.encoding, errors=file.errors)
+    try:
+        yield from write(text, fields, *args, **kwargs)
+    finally:
+        text.flush()
+        # closing the text would close the compressor, which closes only the files that it has opened
+        text.detach()
+        compressor.close()
+
+
+def compressing_writer(write: Callable[..., Generator]) -> Callable[..., Generator]:
+    """
+    Decorator for the writer methods, that adds the keyword argument compression
+
+    If it's one of COMPRESSIONS, the output is compressed, otherwise the writer is unchanged.
+    Raises ValueError for other compressions and for the files without the binary buffer, like StringIO
+    """
+    @functools.wraps(write)
+    def wrapper(file: TextIO, fields: List[str], *args: Any, compression: Optional[str] = None, **kwargs: Any) -> Generator:
+        if compression is None:
+            return write(file, fields, *args, **kwargs)
+        if compression not in _openers:
+            raise ValueError(f"Unsupported compression {compression}, the supported ones are {', '.join(COMPRESSIONS)}")
+        if getattr(file, 'buffer', None) is None:
+            # the compressed bytes are written below the text layer, a StringIO doesn't have it
+            raise ValueError(f"The {compression} compressed output needs a text file with a binary buffer, not {type(file).__name__}")
+        return _compressed_writer(write, file, fields, compression, args, kwargs)
+    return wrapper
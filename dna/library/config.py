@@ -5,8 +5,6 @@ from dataclasses import dataclass
 from pathlib import Path
 import json
 
-import appdirs
-
 
 @dataclass
 class Config():
@@ -17,6 +15,8 @@ def _read_config() -> Optional[Config]:
     """
     Reads `DNAconvert/config.json` in `user_config_dir`
     """
+    # appdirs is needed only when the configuration is read
+    import appdirs
     config_path = Path(appdirs.user_config_dir(
         appname="DNAconvert", appauthor="iTaxoTools")) / "config.json"
     if not config_path.exists():
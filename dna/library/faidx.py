@@ -0,0 +1,196 @@
+from typing import Dict, Iterator, List, NamedTuple, Optional, TextIO, Union
+import mmap
+import os
+from .record import *
+from .compression import MAGIC_SIZE, detect_compression
+
+
+# the amount of sequence bytes checked at once by build_fasta_index
+FASTA_INDEX_BLOCK_SIZE = 1 << 20
+
+
+class FastaIndexEntry(NamedTuple):
+    """
+    The line of a .fai index, as written by samtools faidx
+
+    name is the identifier up to the first whitespace,
+    length is the number of bases, offset is the position of the first base in the file,
+    line_bases and line_width are the number of bases and bytes in each line, except the last one
+    """
+    name: str
+    length: int
+    offset: int
+    line_bases: int
+    line_width: int
+
+
+def build_fasta_index(data: Union[bytes, mmap.mmap]) -> List[FastaIndexEntry]:
+    """
+    Returns the index entries of the records in the FASTA data
+
+    Raises ValueError if the lines of a sequence have different lengths, except the last one
+    """
+    entries = []
+    # the first record starts with '>' at the beginning of a line
+    start = 0
+    if data[:1] != b'>':
+        start = data.find(b'\n>')
+        if start != -1:
+            start += 1
+    while start != -1:
+        header_end = data.find(b'\n', start)
+        if header_end == -1:
+            header_end = len(data)
+        offset = min(header_end + 1, len(data))
+        # the next record starts at the beginning of a line
+        next_start = data.find(b'\n>', header_end)
+        end = len(data) if next_start == -1 else next_start + 1
+        # the blank lines at the end are not part of the sequence
+        content_end = end
+        while content_end > offset and data[content_end - 1] in b'\r\n':
+            content_end -= 1
+
+        name = data[start + 1:header_end].decode('utf-8', errors='replace').split(maxsplit=1)
+        first_line_end = data.find(b'\n', offset, content_end)
+        if first_line_end == -1:
+            # the sequence is on one line
+            line_bases = content_end - offset
+            line_width = line_bases + (2 if data[content_end:content_end + 2] == b'\r\n' else 1)
+            length = line_bases
+        else:
+            line_width = first_line_end + 1 - offset
+            line_bases = line_width - (2 if data[first_line_end - 1:first_line_end] == b'\r' else 1)
+            # each full line ends at a multiple of line_width, the last line is shorter and has no line break.
+            # The sequence is checked in blocks of whole lines, so a long sequence is not copied out of the data at once
+            block_size = max(1, FASTA_INDEX_BLOCK_SIZE // line_width) * line_width
+            line_breaks = 0
+            aligned = True
+            for block_start in range(offset, content_end, block_size):
+                block = data[block_start:min(block_start + block_size, content_end)]
+                full_line_ends = block[line_width - 1::line_width]
+                block_breaks = block.count(b'\n')
+                if full_line_ends.count(b'\n') != len(full_line_ends) or block_breaks != len(full_line_ends):
+                    aligned = False
+                    break
+                line_breaks += block_breaks
+            if not aligned or (content_end - offset) % line_width > line_bases:
+                raise ValueError(f"FASTA index: the lines of the sequence {name[0] if name else ''!r} have different lengths")
+            length = content_end - offset - line_breaks * (line_width - line_bases)
+        entries.append(FastaIndexEntry(name[0] if name else '', length, offset, line_bases, line_width))
+        start = next_start if next_start == -1 else next_start + 1
+    return entries
+
+
+def write_fasta_index(entries: List[FastaIndexEntry], file: TextIO) -> None:
+    """Writes the index entries in the .fai format"""
+    for entry in entries:
+        print(*entry, sep='\t', file=file)
+
+
+def read_fasta_index(file: TextIO) -> List[FastaIndexEntry]:
+    """Reads the index entries in the .fai format"""
+    entries = []
+    for line in file:
+        name, length, offset, line_bases, line_width = line.rstrip('\n').split('\t')[:5]
+        entries.append(FastaIndexEntry(name, int(length), int(offset), int(line_bases), int(line_width)))
+    return entries
+
+
+class IndexedFasta:
+    """
+    Random access to the records of a FASTA file through its .fai index
+
+    The file is memory mapped, so only the requested parts are read.
+    The records are identified by the index (ordinal) or by the name (the identifier up to the first whitespace).
+    The index is read from path + '.fai', if it's newer than the file, otherwise it's built and saved there
+    """
+
+    def __init__(self, path: str, index: Optional[List[FastaIndexEntry]] = None):
+        with open(path, mode='rb') as file:
+            if detect_compression(file.read(MAGIC_SIZE)):
+                raise ValueError("FASTA index: compressed files cannot be indexed")
+            if os.fstat(file.fileno()).st_size:
+                self._data: Union[bytes, mmap.mmap] = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                # an empty file cannot be mapped
+                self._data = b''
+        self.index = index if index is not None else self._load_index(path)
+        # the first record with the name is found by the name
+        self._ordinals: Dict[str, int] = {}
+        for ordinal, entry in enumerate(self.index):
+            self._ordinals.setdefault(entry.name, ordinal)
+
+    def _load_index(self, path: str) -> List[FastaIndexEntry]:
+        index_path = path + '.fai'
+        try:
+            if os.path.getmtime(index_path) >= os.path.getmtime(path):
+                with open(index_path) as index_file:
+                    return read_fasta_index(index_file)
+        except (OSError, ValueError):
+            pass
+        index = build_fasta_index(self._data)
+        try:
+            with open(index_path, mode='w') as index_file:
+                write_fasta_index(index, index_file)
+        except OSError:
+            # the index is kept only in memory
+            pass
+        return index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._ordinals
+
+    def entry(self, key: Union[int, str]) -> FastaIndexEntry:
+        """Returns the index entry of the record with the given ordinal or name"""
+        if isinstance(key, int):
+            return self.index[key]
+        return self.index[self._ordinals[key]]
+
+    def sequence(self, key: Union[int, str], start: int = 0, end: Optional[int] = None) -> str:
+        """
+        Returns the bases from start to end (0-based, end excluded) of the record with the given ordinal or name
+
+        Only the bytes of the requested bases are read
+        """
+        entry = self.entry(key)
+        start = max(0, min(start, entry.length))
+        end = entry.length if end is None else max(start, min(end, entry.length))
+        if start == end:
+            return ""
+        first = entry.offset + start // entry.line_bases * entry.line_width + start % entry.line_bases
+        last = entry.offset + (end - 1) // entry.line_bases * entry.line_width + (end - 1) % entry.line_bases
+        chunk = self._data[first:last + 1]
+        if entry.line_width > entry.line_bases:
+            chunk = chunk.replace(b'\n', b'').replace(b'\r', b'')
+        return chunk.decode('utf-8', errors='replace')
+
+    def seqid(self, key: Union[int, str]) -> str:
+        """Returns the whole identifier line, without the initial '>', of the record with the given ordinal or name"""
+        entry = self.entry(key)
+        # the line break before the sequence is not a part of the identifier
+        header_end = entry.offset - 1 if entry.offset and self._data[entry.offset - 1:entry.offset] == b'\n' else entry.offset
+        # the identifier line starts with '>' after the previous line break
+        start = self._data.rfind(b'\n', 0, header_end) + 1
+        return self._data[start + 1:header_end].decode('utf-8', errors='replace').rstrip()
+
+    def record(self, key: Union[int, str]) -> Record:
+        """Returns the record with the given ordinal or name, with the same fields as Fastafile.read"""
+        return Record(seqid=self.seqid(key), sequence=self.sequence(key))
+
+    def records(self) -> Iterator[Record]:
+        """Returns iterator over all records in the file order"""
+        for ordinal in range(len(self.index)):
+            yield self.record(ordinal)
+
+    def close(self) -> None:
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+
+    def __enter__(self) -> 'IndexedFasta':
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
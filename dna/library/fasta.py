@@ -2,7 +2,10 @@ import re
 import warnings
 from .record import *
 from .utils import *
-from typing import TextIO, Iterator, List, Generator, Tuple, Set
+from .columnar import RecordBatch, RECORD_BATCH_SIZE
+from .compression import compressing_writer, decompressing_reader
+from .profiling import profiled_reader, profiled_writer, timed
+from typing import TextIO, BinaryIO, Iterable, Iterator, List, Generator, Tuple, Set
 
 
 def split_file(file: TextIO) -> Iterator[List[str]]:
@@ -36,14 +39,124 @@ def split_file(file: TextIO) -> Iterator[List[str]]:
     yield chunk
 
 
+# the amount of characters read at once by fasta_records
+FASTA_BLOCK_SIZE = 1 << 20
+
+# ASCII whitespace characters that are not line breaks
+_inline_ascii_space = (' ', '\t', '\r', '\x0b', '\x0c', '\x1c', '\x1d', '\x1e', '\x1f')
+
+# matches whitespace that is not a line break
+_inline_space_regex = re.compile(r'[^\S\n]')
+
+
+def _has_inline_space(text: str) -> bool:
+    """
+    Checks if the text contains whitespace other than line breaks
+    """
+    if text.isascii():
+        # substring search is much faster than the regex
+        return any(space in text for space in _inline_ascii_space)
+    return _inline_space_regex.search(text) is not None
+
+
+def _fasta_record(chunk: str, clean: bool) -> Tuple[str, str]:
+    """
+    Splits the text of a record into the identifier line and the sequence
+
+    clean means that the chunk contains no whitespace other than line breaks
+    """
+    ident, _, body = chunk.partition('\n')
+    if not clean:
+        # strip every line separately, the blank lines become empty
+        sequence = "".join(line.rstrip() for line in body.split('\n'))
+    else:
+        # the lines can be concatenated directly
+        sequence = body.replace('\n', '')
+    return ident.rstrip(), sequence
+
+
+def fasta_records(file: TextIO, block_size: int = FASTA_BLOCK_SIZE) -> Iterator[Tuple[str, str]]:
+    """
+    Returns iterator that yield records as pairs of the identifier line and the sequence
+
+    The identifier line is given without the initial '>'.
+    The file is read in blocks of block_size characters.
+    """
+    # the text of the current record that is split between blocks
+    pieces: List[str] = []
+    # becomes True when the first record begins
+    in_record = False
+    # the beginning of the file counts as the beginning of a line
+    at_line_start = True
+    # whether the pieces of the current record contain only line breaks as whitespace
+    clean = True
+
+    for block in iter(lambda: file.read(block_size), ""):
+        # the check is done once per block, instead of once per record
+        block_clean = not _has_inline_space(block)
+        block_start, at_line_start = at_line_start, block[-1] == '\n'
+
+        # the record boundary is between the blocks
+        if block_start and block[0] == '>':
+            if in_record:
+                yield _fasta_record("".join(pieces), clean)
+            pieces = []
+            clean = True
+            in_record = True
+            block = block[1:]
+
+        # each part except the first one is a record without the initial '>'
+        parts = block.split('\n>')
+        # the first part continues the current record
+        if in_record:
+            pieces.append(parts[0])
+            clean = clean and block_clean
+        if len(parts) > 1:
+            if in_record:
+                yield _fasta_record("".join(pieces), clean)
+            for part in parts[1:-1]:
+                yield _fasta_record(part, block_clean)
+            # the last part can continue in the next block
+            pieces = [parts[-1]]
+            clean = block_clean
+            in_record = True
+
+    # yield the last record
+    if in_record:
+        yield _fasta_record("".join(pieces), clean)
+
+
+def _fasta_batches(file: TextIO, fields: List[str], parse_ident: Callable[[str], Dict[str, str]], batch_size: int) -> Callable[[], Iterator[RecordBatch]]:
+    """
+    Returns the generator of the batches of the FASTA-type records
+
+    parse_ident takes the identifier line without the initial '>'
+    and returns the values of the fields other than 'sequence'
+    """
+    def batch_generator() -> Iterator[RecordBatch]:
+        batch = RecordBatch(fields)
+        for ident, sequence in fasta_records(file):
+            batch.append(sequence, **parse_ident(ident))
+            if len(batch) == batch_size:
+                yield batch
+                batch = RecordBatch(fields)
+        if len(batch):
+            yield batch
+    return batch_generator
+
+
 class Fastafile:
     """ Class for standard FASTA files"""
 
     @staticmethod
+    @profiled_writer
+    @compressing_writer
     def write(file: TextIO, fields: List[str]) -> Generator:
         """FASTA writer method"""
         # the standard NameAssembler
         name_assembler = NameAssembler(fields)
+        # collects the output to write it in large chunks
+        output = OutputBuffer(file)
 
         # the writing loop
         while True:
@@ -53,24 +166,42 @@ class Fastafile:
             except GeneratorExit:
                 break
 
-            # print the unique name
-            print(">", name_assembler.name(record), sep="", file=file)
+            # write the unique name and the sequence
+            output.write(f">{name_assembler.name(record)}\n{record['sequence']}\n")
+        output.flush()
+
+    @staticmethod
+    def _read_batches(file: TextIO, batch_size: int) -> Tuple[List[str], Callable[[], Iterator[RecordBatch]]]:
+        # FASTA always have the same fields
+        fields = ['seqid', 'sequence']
+        # 'seqid' is the first line without the initial character
+        # 'sequence' is the concatenation of all the other lines
+        return fields, _fasta_batches(file, fields, lambda ident: {'seqid': ident}, batch_size)
 
-            # print the sequence
-            print(record['sequence'], file=file)
+    @staticmethod
+    @profiled_reader
+    @decompressing_reader
+    def read_batches(file: TextIO, batch_size: int = RECORD_BATCH_SIZE) -> Tuple[List[str], Callable[[], Iterator[RecordBatch]]]:
+        """FASTA batch reader method"""
+        return Fastafile._read_batches(file, batch_size)
 
     @staticmethod
+    @profiled_reader
+    @decompressing_reader
     def read(file: TextIO) -> Tuple[List[str], Callable[[], Iterator[Record]]]:
         """FASTA reader method"""
+        return Fastafile._read(file)
 
+    @staticmethod
+    def _read(file: TextIO) -> Tuple[List[str], Callable[[], Iterator[Record]]]:
         # FASTA always have the same fields
         fields = ['seqid', 'sequence']
 
         def record_generator() -> Iterator[Record]:
-            for chunk in split_file(file):
+            for ident, sequence in fasta_records(file):
                 # 'seqid' is the first line without the initial character
                 # 'sequence' is the concatenation of all the other lines
-                yield Record(seqid=chunk[0][1:], sequence="".join(chunk[1:]))
+                yield Record(seqid=ident, sequence=sequence)
         return fields, record_generator
 
 
@@ -92,11 +223,16 @@ class SpeciesNamer:
 
     name(record: Record) -> str
         returns Hapview short species name for the given record
+
+    name_of(species: Optional[str]) -> str
+        returns Hapview short species name for the given value of the species field
     """
 
-    def __init__(self, species: Set[str], species_field: Optional[str]):
+    def __init__(self, species: Iterable[str], species_field: Optional[str]):
         """
-        species is the set of species' names in the input file.
+        species is the collection of species' names in the input file.
+        The short names are given in its order,
+        names that are not in it get their short names on the first use.
         species_field is the name of the field that contains the species' name
         """
         # if the species' name is not given
@@ -104,6 +240,7 @@ class SpeciesNamer:
         if not species_field:
             self._count = 0
             self.name = self._count_name
+            self.name_of = self._count_name_of
             return
 
         def short_name(name: str) -> str:
@@ -115,91 +252,291 @@ class SpeciesNamer:
                 raise ValueError(f"Malformed species name {name}")
 
         # make Unicifier for the short names
-        unicifier = UnicifierSN()
+        self._unicifier = UnicifierSN()
+        self._short_name = short_name
 
         # save the field name
         self._species_field = species_field
         # generate a dictionary from the binomial name to the unique short name
-        self._species = {long_name: unicifier.unique(
-            short_name(long_name)) for long_name in species}
+        self._species: Dict[str, str] = {}
+        for long_name in species:
+            self._dict_name_of(long_name)
         # self.name does the lookup in the above dictionary
         self.name = self._dict_name
+        self.name_of = self._dict_name_of
 
     def _count_name(self, record: Record) -> str:
+        return self._count_name_of(None)
+
+    def _count_name_of(self, species: Optional[str]) -> str:
         self._count += 1
         return str(self._count - 1)
 
     def _dict_name(self, record: Record) -> str:
-        return self._species[record[self._species_field]]
+        return self._dict_name_of(record[self._species_field])
+
+    def _dict_name_of(self, species: Optional[str]) -> str:
+        try:
+            return self._species[species]
+        except KeyError:
+            # the species is used for the first time
+            assert species is not None
+            short_name = self._unicifier.unique(self._short_name(species))
+            self._species[species] = short_name
+            return short_name
+
+
+# the size of spooled Hapview records that are kept in memory before moving them to disk
+HAPVIEW_SPOOL_SIZE = 64 << 20
+# the number of the first records, whose equal length allows Hapview writer to write the records as they arrive
+HAPVIEW_PROBE_SIZE = 100
 
 
 class HapviewFastafile:
     """class for the FASTA format of the Haplotype Viewer"""
 
     @ staticmethod
+    @profiled_reader
+    @decompressing_reader
+    def read_batches(file: TextIO, batch_size: int = RECORD_BATCH_SIZE) -> Tuple[List[str], Callable[[], Iterator[RecordBatch]]]:
+        """
+        FASTA Hapview batch reader method
+
+        The same as for the standard FASTA
+        """
+        return Fastafile._read_batches(file, batch_size)
+
+    @ staticmethod
+    @profiled_reader
+    @decompressing_reader
     def read(file: TextIO) -> Tuple[List[str], Callable[[], Iterator[Record]]]:
         """
         FASTA Hapview reader method
 
         The same as for the standard FASTA     
         """
-        # FASTA always have the same fields
-        fields = ['seqid', 'sequence']
-
-        def record_generator() -> Iterator[Record]:
-            for chunk in split_file(file):
-                # 'seqid' is the first line without the initial character
-                # 'sequence' is the concatenation of all the other lines
-                yield Record(seqid=chunk[0][1:], sequence="".join(chunk[1:]))
-        return fields, record_generator
+        return Fastafile._read(file)
 
     @ staticmethod
-    def write(file: TextIO, fields: List[str]) -> Generator:
-        """FASTA Hapview writer method"""
+    @profiled_writer
+    @compressing_writer
+    def write(file: TextIO, fields: List[str], declared_length: Optional[int] = None) -> Generator:
+        """
+        FASTA Hapview writer method
+
+        All sequences in the output should have the same length.
+        declared_length is this length, if it's known, then the records are written as they arrive,
+        without keeping them, and a sequence of a different length raises ValueError.
+        Otherwise, if the file is seekable and the first HAPVIEW_PROBE_SIZE sequences have the same length,
+        the records are written as they arrive, as long as their sequences have this length.
+        In the other cases the records are written after the last one, with the shorter sequences padded
+        """
         # if there is a field with the name of the species
-        # then aggregate the names into a set
+        # then aggregate the names into a dictionary, which keeps their order
         # else use the standard Phylip Aggregator
         species_field = get_species_field(fields)
+
+        # creates or copies the seqid
+        name_assembler = NameAssembler(fields)
+        # makes the seqid unique
+        unicifier = Unicifier(100)
+
+        if declared_length is not None:
+            # all the sequences have the known length, nothing needs to be kept
+            output = OutputBuffer(file)
+            species_namer = SpeciesNamer([], species_field)
+            while True:
+                try:
+                    record = yield
+                except GeneratorExit:
+                    break
+                name = unicifier.unique(name_assembler.name(record))
+                sequence = record['sequence']
+                if len(sequence) != declared_length:
+                    raise ValueError(f"Hapview: the sequence of {name} has the length {len(sequence)}, instead of {declared_length}")
+                output.write(f">{name}.{species_namer.name_of(record[species_field] if species_field else None)}\n{sequence}\n")
+            output.flush()
+            return
+
         if species_field:
-            def species_reducer(acc: Set[str], record: Record) -> Set[str]:
+            def species_reducer(acc: Dict[str, None], record: Record) -> Dict[str, None]:
                 assert species_field is not None
-                acc.add(record[species_field])
+                acc[record[species_field]] = None
                 return acc
-            aggregator = PhylipAggregator((set(), species_reducer))
+            aggregator = PhylipAggregator(({}, species_reducer))
         else:
             aggregator = PhylipAggregator()
 
-        # collect the record and aggregate the information about them
-        records = []
-        while True:
-            try:
-                record = yield
-            except GeneratorExit:
-                break
-            aggregator.send(record)
-            records.append(record)
-        [max_length, min_length, species] = aggregator.results()
-
-        # will create the short species' names
-        species_namer = SpeciesNamer(species, species_field)
-        # will ensure that all sequences have the same length
-        aligner = dna_aligner(max_length, min_length)
-        # creates or copies the seqid
-        name_assembler = NameAssembler(fields)
-        # makes the seqid unique
-        unicifier = Unicifier(100)
+        # the records are written as they arrive, while their length is the expected one.
+        # The written records are discarded by seeking back, when a sequence of another length arrives
+        streaming = file.seekable()
+        if streaming:
+            start = file.tell()
+            output = OutputBuffer(file)
+            streaming_namer = SpeciesNamer([], species_field)
+        expected_length: Optional[int] = None
+        # the first records, that decide the expected length
+        probe: List[Tuple[str, Optional[str], str]] = []
+
+        # only the Hapview writer needs the spool, the modules are not imported with the other formats
+        import pickle
+        import tempfile
+
+        # the records are spooled in the order of arrival,
+        # only the parts needed for writing are kept.
+        # The spool is moved to disk when it becomes large, which bounds the memory usage
+        with tempfile.SpooledTemporaryFile(max_size=HAPVIEW_SPOOL_SIZE) as spool:
+            pickler = pickle.Pickler(spool, protocol=pickle.HIGHEST_PROTOCOL)
+            count = 0
+
+            # aggregate the information about the records and spool them
+            while True:
+                try:
+                    record = yield
+                except GeneratorExit:
+                    break
+                aggregator.send(record)
+                # the seqid doesn't depend on the aggregated information
+                item = (unicifier.unique(name_assembler.name(record)),
+                        record[species_field] if species_field else None,
+                        record['sequence'])
+                pickler.dump(item)
+                # the memo would keep references to all the records
+                pickler.clear_memo()
+                count += 1
+
+                if not streaming:
+                    continue
+                if expected_length is None:
+                    # the expected length is decided by the first records
+                    probe.append(item)
+                    if len(probe) < HAPVIEW_PROBE_SIZE:
+                        continue
+                    expected_length = len(probe[0][2])
+                    items, probe = probe, []
+                else:
+                    items = [item]
+                if any(len(sequence) != expected_length for _, _, sequence in items):
+                    # the records will be written after the last one
+                    streaming = False
+                    continue
+                for name, species_name, sequence in items:
+                    output.write(f">{name}.{streaming_namer.name_of(species_name)}\n{sequence}\n")
+
+            if streaming and expected_length is not None:
+                # all the records had the expected length and are written
+                output.flush()
+                return
+            if expected_length is not None:
+                # discard the already written records, only the seekable files stream
+                file.seek(start)
+                file.truncate()
+
+            results = aggregator.results()
+            max_length, min_length = results[0], results[1]
+            species = results[2] if species_field else []
+
+            # will create the short species' names
+            species_namer = SpeciesNamer(species, species_field)
+            # will ensure that all sequences have the same length
+            aligner = dna_aligner(max_length, min_length)
+
+            # read the spooled records back and write them
+            spool.seek(0)
+            unpickler = pickle.Unpickler(spool)
+            output = OutputBuffer(file)
+            for _ in range(count):
+                name, species_name, sequence = unpickler.load()
+                output.write(f">{name}.{species_namer.name_of(species_name)}\n{aligner(sequence)}\n")
+            output.flush()
+
+
+# the amount of bytes read at once by FastQFile.to_fasta_bytes
+FASTQ_BLOCK_SIZE = 1 << 22
+
+
+def _fastq_block_to_fasta(lines: List[bytes], first_record: int) -> bytes:
+    """
+    Converts complete FastQ records, given as lines, into FASTA text
 
-        # write the records
-        for record in records:
-            print('>', unicifier.unique(name_assembler.name(record)),
-                  '.', species_namer.name(record), sep="", file=file)
-            print(aligner(record['sequence']), file=file)
+    Raises ValueError if the lines are not aligned to the records.
+    first_record is the number of the first record, used in the error message
+    """
+    seqids = lines[0::4]
+    sequences = lines[1::4]
+    separators = lines[2::4]
+    quality_scores = lines[3::4]
+
+    # check the first character of the seqid and separator lines
+    if b"".join([seqid[:1] for seqid in seqids]) != b"@" * len(seqids) \
+            or b"".join([separator[:1] for separator in separators]) != b"+" * len(separators):
+        bad = next(i for i in range(len(seqids))
+                   if seqids[i][:1] != b"@" or separators[i][:1] != b"+")
+        raise ValueError(f"FastQ: record {first_record + bad + 1} is malformed\n" +
+                         seqids[bad].decode(errors='replace'))
+    # the quality score should have the same length as the sequence
+    if list(map(len, sequences)) != list(map(len, quality_scores)):
+        bad = next(i for i in range(len(sequences))
+                   if len(sequences[i]) != len(quality_scores[i]))
+        raise ValueError(f"FastQ: the quality score of record {first_record + bad + 1} doesn't match the sequence\n" +
+                         seqids[bad].decode(errors='replace'))
+
+    # interleave the seqids and the sequences
+    fasta_lines: List[bytes] = [b""] * (2 * len(seqids))
+    fasta_lines[0::2] = [b">" + seqid[1:] for seqid in seqids]
+    fasta_lines[1::2] = sequences
+    fasta_lines.append(b"")
+    return b"\n".join(fasta_lines)
 
 
 class FastQFile:
     """class for the FastQ format"""
 
     @ staticmethod
+    @decompressing_reader
+    def to_fasta_bytes(infile: BinaryIO, outfile: BinaryIO, block_size: int = FASTQ_BLOCK_SIZE) -> int:
+        """
+        Quick conversion from FastQ to FASTA on binary files
+
+        The input is read in blocks of block_size bytes and split into records of 4 lines,
+        each block is written with one call.
+        Unlike to_fasta, the records are validated, so quality scores starting with '@' are handled correctly.
+        Returns the number of records
+        """
+        # the incomplete lines and records at the end of the previous block
+        leftover = b""
+        count = 0
+        while True:
+            block = infile.read(block_size)
+            data = leftover + block
+            if b"\r" in data:
+                data = data.replace(b"\r\n", b"\n")
+            lines = data.split(b"\n")
+            if block:
+                # the last line can continue in the next block
+                leftover = lines.pop()
+            else:
+                # end of the file, the blank lines at the end are ignored
+                while lines and not lines[-1].strip():
+                    lines.pop()
+                leftover = b""
+
+            # the lines of the last incomplete record
+            complete = len(lines) - len(lines) % 4
+            if complete < len(lines):
+                if not block:
+                    raise ValueError(f"FastQ: record {count + complete // 4 + 1} is incomplete")
+                leftover = b"\n".join(lines[complete:] + [leftover])
+                del lines[complete:]
+
+            if lines:
+                outfile.write(_fastq_block_to_fasta(lines, count))
+                count += len(lines) // 4
+            if not block:
+                return count
+
+    @ staticmethod
+    @decompressing_reader
     def to_fasta(infile: TextIO, outfile: TextIO) -> None:
         """Quick conversion from FastQ to FASTA"""
         for line in infile:
@@ -212,6 +549,39 @@ class FastQFile:
                 print(line, file=outfile, end="")
 
     @ staticmethod
+    def _read_batches(file: TextIO, batch_size: int) -> Tuple[List[str], Callable[[], Iterator[RecordBatch]]]:
+        # FastQ always have the same fields
+        fields = ['seqid', 'sequence',
+                  'quality_score_identifier', 'quality_score']
+
+        def batch_generator() -> Iterator[RecordBatch]:
+            batch = RecordBatch(fields)
+            for line in file:
+                # loop until the start of a record
+                # then read 4 lines and put them into the batch as a record
+                if line[0] == '@':
+                    seqid = line[1:].rstrip()
+                    sequence = file.readline().rstrip()
+                    quality_score_identifier = file.readline().rstrip()
+                    quality_score = file.readline().rstrip()
+                    batch.append(sequence, seqid=seqid, quality_score_identifier=quality_score_identifier, quality_score=quality_score)
+                    if len(batch) == batch_size:
+                        yield batch
+                        batch = RecordBatch(fields)
+            if len(batch):
+                yield batch
+        return fields, batch_generator
+
+    @ staticmethod
+    @profiled_reader
+    @decompressing_reader
+    def read_batches(file: TextIO, batch_size: int = RECORD_BATCH_SIZE) -> Tuple[List[str], Callable[[], Iterator[RecordBatch]]]:
+        """FastQ batch reader method"""
+        return FastQFile._read_batches(file, batch_size)
+
+    @ staticmethod
+    @profiled_reader
+    @decompressing_reader
     def read(file: TextIO) -> Tuple[List[str], Callable[[], Iterator[Record]]]:
         """FastQ reader method"""
         # FastQ always have the same fields
@@ -231,6 +601,8 @@ class FastQFile:
         return fields, record_generator
 
     @ staticmethod
+    @profiled_writer
+    @compressing_writer
     def write(file: TextIO, fields: List[str]) -> Generator:
         """FastQ writer method"""
 
@@ -239,17 +611,18 @@ class FastQFile:
             raise ValueError(
                 'FastQ requires the fields seqid, sequence, quality_score_identifier and quality_score')
 
+        # collects the output to write it in large chunks
+        output = OutputBuffer(file)
+
         while True:
             # get the record
             try:
                 record = yield
             except GeneratorExit:
                 break
-            # write the name
-            print('@', record['seqid'], sep="", file=file)
-            # write the other attributes
-            for field in ['sequence', 'quality_score_identifier', 'quality_score']:
-                print(record[field], file=file)
+            # write the name and the other attributes
+            output.write(f"@{record['seqid']}\n{record['sequence']}\n{record['quality_score_identifier']}\n{record['quality_score']}\n")
+        output.flush()
 
 
 class NameAssemblerGB(NameAssembler):
@@ -260,11 +633,17 @@ class NameAssemblerGB(NameAssembler):
 
     def __init__(self, fields: List[str]):
         if 'seqid' in fields:
-            self.name = self._simple_name
+            self.name = timed(self._simple_name, 'NameAssembler.name')
         else:
             self._fields = [field for field in [
                 'organism', 'specimen_voucher'] if field in fields]
-            self.name = self._complex_name
+            self.name = timed(self._complex_name, 'NameAssembler.name')
+
+
+# matches [field=value] in the identifier line of Genbank FASTA, field is stored in group 1, value in group 2
+_genbank_field_value_regex = re.compile(r'\[([^=\]]+)=([^\]]+)\]')
+# separates country, region and locality
+_genbank_place_regex = re.compile(r'[,:] ')
 
 
 class GenbankFastaFile:
@@ -307,6 +686,20 @@ class GenbankFastaFile:
     @ staticmethod
     def parse_ident(line: str) -> Tuple[str, Dict[str, str]]:
         """Reads the attributes from the first line of Genbank FASTA record. Returns seqid and the dictionary of attributes"""
+        seqid, values = GenbankFastaFile.parse_present_ident(line)
+
+        # initialise all the missing fields
+        for field in GenbankFastaFile.genbankfields:
+            if not (field == "seqid" or field == "sequence"):
+                values.setdefault(field, "")
+        return seqid, values
+
+    @ staticmethod
+    def parse_present_ident(line: str) -> Tuple[str, Dict[str, str]]:
+        """
+        Reads the attributes from the first line of Genbank FASTA record.
+        Returns seqid and the dictionary of the attributes that are present in the line
+        """
         # raise an error if the line is invalid
         if line[0] != '>':
             raise ValueError("Genbank fasta: invalid identifier line\n" + line)
@@ -315,41 +708,69 @@ class GenbankFastaFile:
 
         # collect the attributes
         values: Dict[str, str] = {}
-        # the regex matches [field=value], field is stored in group 1, value in group 2
-        field_value_regex = r'\[([^=\]]+)=([^\]]+)\]'
-        for m in re.finditer(field_value_regex, values_str):
-            field = m.group(1).strip()
-            value = m.group(2).strip()
+        # all the attributes are found in one pass of the compiled regex
+        for field, value in _genbank_field_value_regex.findall(values_str):
+            field = field.strip()
+            value = value.strip()
             if field == 'country':
                 # special treatment for the country field
                 # split into country, region, locality
-                place = re.split(r'[,:] ', value)
+                place = _genbank_place_regex.split(value)
                 # put into the dictionary
                 values.update(
                     zip(['country', 'region', 'locality'], place + ['', '']))
             else:
                 values[field] = value
-
-        # initialise all the missing fields
-        for field in GenbankFastaFile.genbankfields:
-            if not (field == "seqid" or field == "sequence"):
-                values.setdefault(field, "")
         return seqid, values
 
     @ staticmethod
+    def _read_batches(file: TextIO, batch_size: int) -> Tuple[List[str], Callable[[], Iterator[RecordBatch]]]:
+        fields = GenbankFastaFile.genbankfields
+
+        def parse_ident(ident: str) -> Dict[str, str]:
+            # parse the seqid and attributes
+            seqid, values = GenbankFastaFile.parse_present_ident('>' + ident)
+            values['seqid'] = seqid
+            return values
+        return fields, _fasta_batches(file, fields, parse_ident, batch_size)
+
+    @ staticmethod
+    @profiled_reader
+    @decompressing_reader
+    def read_batches(file: TextIO, batch_size: int = RECORD_BATCH_SIZE) -> Tuple[List[str], Callable[[], Iterator[RecordBatch]]]:
+        """
+        Genbank FASTA batch reader method
+
+        Only the attributes present in the file get a column
+        """
+        return GenbankFastaFile._read_batches(file, batch_size)
+
+    @ staticmethod
+    @profiled_reader
+    @decompressing_reader
     def read(file: TextIO) -> Tuple[List[str], Callable[[], Iterator[Record]]]:
-        """Genbank FASTA reader method"""
+        """
+        Genbank FASTA reader method
+
+        The records store only the attributes present in the file,
+        the other Genbank fields are "" on access
+        """
         def record_generator() -> Iterator[Record]:
-            for chunk in split_file(file):
-                ident = chunk[0]
+            for ident, sequence in fasta_records(file):
                 # parse the seqid and attributes
-                seqid, values = GenbankFastaFile.parse_ident(ident)
-                yield Record(seqid=seqid, sequence="".join(chunk[1:]), **values)
+                seqid, values = GenbankFastaFile.parse_present_ident('>' + ident)
+                yield GenbankRecord(seqid=seqid, sequence=sequence, **values)
         return GenbankFastaFile.genbankfields, record_generator
 
     @staticmethod
-    def write(file: TextIO, fields: List[str]) -> Generator:
-        """Genbank FASTA writer method"""
+    @profiled_writer
+    @compressing_writer
+    def write(file: TextIO, fields: List[str], first_record: int = 0) -> Generator:
+        """
+        Genbank FASTA writer method
+
+        first_record is the number of the records before the first one, if the file is written in parts
+        """
         # discard the invalid fields
         fields = [
             field for field in fields if field.replace('_', '-') in GenbankFastaFile.genbankfields]
@@ -365,7 +786,11 @@ class GenbankFastaFile:
         # creates seqid for Genbank FASTA
         name_assembler = NameAssemblerGB(fields)
         # makes the seqid unique within 25 characters
-        unicifier = Unicifier(25)
+        unicifier = Unicifier(25, start=first_record)
+        # standardizes the records
+        prepare = timed(GenbankFastaFile.prepare, 'GenbankFastaFile.prepare')
+        # collects the output to write it in large chunks
+        output = OutputBuffer(file)
 
         # receive the records and write them
         while True:
@@ -375,7 +800,7 @@ class GenbankFastaFile:
                 break
 
             # standardize the record
-            GenbankFastaFile.prepare(fields, record)
+            prepare(fields, record)
 
             # raise the warning if the sequence <200 bp and turn off the checking for this
             if length_okay and len(record['sequence']) < 200:
@@ -387,23 +812,58 @@ class GenbankFastaFile:
             if no_dashes and '-' in record['sequence']:
                 no_dashes = False
                 warnings.warn("Some of your sequences contain dashes (gaps) which is only allowed if you submit them as alignment. If you do not wish to submit your sequences as alignment, please remove the dashes before conversion.")
-            # print seqid and attributes
-            print('>'+unicifier.unique(name_assembler.name(record)), *
-                  [f"[{field.replace('_', '-')}={record[field].strip()}]" for field in fields if record[field] and not record[field].isspace() and not (field == "seqid" or field == "sequence")], file=file)
-            # print the sequence
-            print(record['sequence'], file=file)
+            # write seqid and attributes
+            output.write(" ".join(['>'+unicifier.unique(name_assembler.name(record))] +
+                                  [f"[{field.replace('_', '-')}={record[field].strip()}]" for field in fields if record[field] and not record[field].isspace() and not (field == "seqid" or field == "sequence")]))
+            # write the sequence
+            output.write(f"\n{record['sequence']}\n")
+        output.flush()
+
+
+class GenbankRecord(Record):
+    """
+    Record of Genbank FASTA that resolves the missing Genbank fields to ""
+
+    It saves storing the 50 Genbank fields in each record
+    """
+
+    # the fields that have the default value ""
+    defaulted_fields = frozenset(field for field in GenbankFastaFile.genbankfields
+                                 if not (field == "seqid" or field == "sequence"))
+
+    def __getitem__(self, field: str) -> str:
+        try:
+            return super().__getitem__(field)
+        except KeyError:
+            if field in GenbankRecord.defaulted_fields:
+                return ""
+            raise
+
+    def get(self, field: str, default: Any = None) -> Any:
+        try:
+            return self[field]
+        except KeyError:
+            return default
 
 
 class MoidFastaFile:
     """class for MoID FASTA format"""
     @staticmethod
-    def write(file: TextIO, fields: List[str]) -> Generator:
-        """MoID writer method"""
+    @profiled_writer
+    @compressing_writer
+    def write(file: TextIO, fields: List[str], first_record: int = 0) -> Generator:
+        """
+        MoID writer method
+
+        first_record is the number of the records before the first one, if the file is written in parts
+        """
 
         # assemble the name from fields if 'specimen_voucher' or 'isolate' is missing
         # in this case, also put a limit on number of characters
         name_assembler = NameAssembler(fields, abbreviate_species=True)
-        unicifier = Unicifier(10)
+        unicifier = Unicifier(10, start=first_record)
+        # collects the output to write it in large chunks
+        output = OutputBuffer(file)
 
         # the writing loop
         while True:
@@ -422,10 +882,32 @@ class MoidFastaFile:
             species = record['species'] if 'species' in fields else record['organism'] if 'organism' in fields else ""
             species = sanitize(species)
 
-            print(">", name, "|", species, sep="", file=file)
-            print(record['sequence'], file=file)
+            output.write(f">{name}|{species}\n{record['sequence']}\n")
+        output.flush()
+
+    @staticmethod
+    def _read_batches(file: TextIO, batch_size: int) -> Tuple[List[str], Callable[[], Iterator[RecordBatch]]]:
+        # MoID always have the same fields
+        fields = ['seqid', 'species', 'sequence']
+
+        def parse_ident(ident: str) -> Dict[str, str]:
+            # 'seqid' is the part of the first line between the initial character and '|'
+            # 'species' is the part of the first line after '|'
+            # 'sequence' is the concatenation of all the other lines
+            seqid, _, species = ident.partition('|')
+            return {'seqid': seqid, 'species': species}
+        return fields, _fasta_batches(file, fields, parse_ident, batch_size)
+
+    @staticmethod
+    @profiled_reader
+    @decompressing_reader
+    def read_batches(file: TextIO, batch_size: int = RECORD_BATCH_SIZE) -> Tuple[List[str], Callable[[], Iterator[RecordBatch]]]:
+        """MoID batch reader method"""
+        return MoidFastaFile._read_batches(file, batch_size)
 
     @staticmethod
+    @profiled_reader
+    @decompressing_reader
     def read(file: TextIO) -> Tuple[List[str], Callable[[], Iterator[Record]]]:
         """MoID reader method"""
 
@@ -433,10 +915,10 @@ class MoidFastaFile:
         fields = ['seqid', 'species', 'sequence']
 
         def record_generator() -> Iterator[Record]:
-            for chunk in split_file(file):
+            for ident, sequence in fasta_records(file):
                 # 'seqid' is the part of the first line between the initial character and '|'
                 # 'species' is the part of the first line after '|'
                 # 'sequence' is the concatenation of all the other lines
-                seqid, _, species = chunk[0][1:].partition('|')
-                yield Record(seqid=seqid, species=species, sequence="".join(chunk[1:]))
+                seqid, _, species = ident.partition('|')
+                yield Record(seqid=seqid, species=species, sequence=sequence)
         return fields, record_generator
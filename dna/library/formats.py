@@ -0,0 +1,44 @@
+from typing import Any, Dict, List, Tuple
+import importlib
+
+
+# the classes with the reader and the writer methods by the name of the format: the module and the class name.
+# The modules are imported when the format is used for the first time, so the start doesn't load all the formats
+_format_paths: Dict[str, Tuple[str, str]] = {
+    'fasta': ('dna.library.fasta', 'Fastafile'),
+    'fasta_hapview': ('dna.library.fasta', 'HapviewFastafile'),
+    'fastq': ('dna.library.fasta', 'FastQFile'),
+    'fasta_gbexport': ('dna.library.fasta', 'GenbankFastaFile'),
+    'moid_fas': ('dna.library.fasta', 'MoidFastaFile'),
+}
+# the classes that have been loaded
+_format_classes: Dict[str, Any] = {}
+
+
+def register_format(name: str, module: str, class_name: str) -> None:
+    """Adds the format, whose class is imported from the module when the format is used"""
+    _format_paths[name] = (module, class_name)
+    _format_classes.pop(name, None)
+
+
+def format_names() -> List[str]:
+    """Returns the names of the registered formats"""
+    return list(_format_paths)
+
+
+def get_format(name: str) -> Any:
+    """
+    Returns the class of the format with the read and write methods
+
+    Raises ValueError if the format is not registered
+    """
+    try:
+        return _format_classes[name]
+    except KeyError:
+        pass
+    try:
+        module, class_name = _format_paths[name]
+    except KeyError:
+        raise ValueError(f"Unknown format {name}, the supported ones are {', '.join(_format_paths)}") from None
+    format_class = _format_classes[name] = getattr(importlib.import_module(module), class_name)
+    return format_class
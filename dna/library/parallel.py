@@ -0,0 +1,318 @@
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, TextIO, Tuple, Type
+import io
+import os
+import shutil
+import tempfile
+import warnings
+from . import utils
+from .compression import MAGIC_SIZE, detect_compression
+from .fasta import Fastafile, HapviewFastafile, FastQFile, GenbankFastaFile, MoidFastaFile
+
+# the approximate size of the parts of the input that are converted in parallel
+PARALLEL_CHUNK_SIZE = 64 << 20
+# the amount of bytes read at once when searching for the boundaries of the parts
+_BOUNDARY_BLOCK_SIZE = 1 << 20
+
+# the formats whose records start with '>' at the beginning of a line
+_fasta_readers = (Fastafile, HapviewFastafile, GenbankFastaFile, MoidFastaFile)
+# the formats whose writers write each record independently of the others
+_chunk_writers = (Fastafile, FastQFile, GenbankFastaFile, MoidFastaFile)
+# the writers that number the records, they take the number of the records before the part
+_numbering_writers = (GenbankFastaFile, MoidFastaFile)
+# the writers that take the length of all the sequences, if it's known
+_length_writers = (HapviewFastafile,)
+
+# the warning raised while converting a part: the message and the category
+_Warning = Tuple[str, Type[Warning]]
+# converts the input text file into the output text file, instead of the reader and writer methods
+Converter = Callable[[TextIO, TextIO], None]
+
+
+def _fasta_boundaries(file: BinaryIO, size: int, chunk_size: int) -> List[int]:
+    """
+    Returns the starts of the FASTA records that are the first ones after every chunk_size bytes
+    """
+    boundaries = []
+    target = chunk_size
+    while target < size:
+        # the record starts with '>' after a line break
+        file.seek(target - 1)
+        # the position of data in the file
+        data_start = target - 1
+        data = b""
+        found = -1
+        while found == -1:
+            block = file.read(_BOUNDARY_BLOCK_SIZE)
+            if not block:
+                return boundaries
+            if data:
+                # the last byte is kept, the line break can be at the end of the previous block
+                data_start += len(data) - 1
+                data = data[-1:] + block
+            else:
+                data = block
+            found = data.find(b"\n>")
+        boundaries.append(data_start + found + 1)
+        target = boundaries[-1] + chunk_size
+    return boundaries
+
+
+def _fastq_boundaries(file: BinaryIO, size: int, chunk_size: int) -> Optional[List[int]]:
+    """
+    Returns the starts of the FastQ records that are the first ones after every chunk_size bytes
+
+    The records are counted as groups of 4 lines from the start of the file.
+    Returns None if a record at a boundary doesn't start with '@' or doesn't have '+' on its third line,
+    then the file cannot be split
+    """
+    boundaries: List[int] = []
+    target = chunk_size
+    # the number of lines and bytes before the current block
+    line_count = 0
+    position = 0
+    # the incomplete line at the end of the previous block
+    leftover = b""
+    file.seek(0)
+    while target < size:
+        data = file.read(_BOUNDARY_BLOCK_SIZE)
+        block = leftover + data
+        # the block ends with a complete line
+        cut = block.rfind(b"\n") + 1 if data else len(block)
+        block, leftover = block[:cut], block[cut:]
+        if not block:
+            if not data:
+                break
+            continue
+        block_end = position + len(block)
+        while target < block_end:
+            # the first line that starts after the target
+            local_target = target - position
+            start = 0 if local_target <= 0 else block.find(b"\n", local_target - 1) + 1
+            line_number = line_count + block.count(b"\n", 0, start)
+            # the first line of the next record
+            while line_number % 4 and start < len(block):
+                start = block.find(b"\n", start) + 1 or len(block)
+                line_number += 1
+            if line_number % 4 or start >= len(block):
+                # the record starts in the next block
+                target = block_end
+                break
+            boundaries.append(position + start)
+            target = boundaries[-1] + chunk_size
+        line_count += block.count(b"\n")
+        position = block_end
+        if not data:
+            break
+
+    # check that the boundaries are at the records
+    for boundary in boundaries:
+        file.seek(boundary)
+        first_line = file.readline()
+        file.readline()
+        if not (first_line.startswith(b"@") and file.readline().startswith(b"+")):
+            return None
+    return boundaries
+
+
+def chunk_boundaries(path: str, reader: Any, chunk_size: int = PARALLEL_CHUNK_SIZE) -> List[Tuple[int, int]]:
+    """
+    Returns the ranges of bytes, that split the file into the parts of about chunk_size bytes at the record boundaries
+
+    reader is the class of the input format.
+    If the file cannot be split, the whole file is one part
+    """
+    size = os.path.getsize(path)
+    with open(path, mode='rb') as file:
+        if detect_compression(file.read(MAGIC_SIZE)):
+            # the compressed files can only be read from the start
+            boundaries: Optional[List[int]] = []
+        elif reader in _fasta_readers:
+            boundaries = _fasta_boundaries(file, size, chunk_size)
+        elif reader is FastQFile:
+            boundaries = _fastq_boundaries(file, size, chunk_size)
+        else:
+            boundaries = []
+    starts = [0] + (boundaries or [])
+    return list(zip(starts, starts[1:] + [size]))
+
+
+def _chunk_file(path: str, start: int, end: int) -> TextIO:
+    """Returns the text of the part of the file"""
+    with open(path, mode='rb') as file:
+        file.seek(start)
+        data = file.read(end - start)
+    # decoded in the same way as the file opened in the text mode
+    return io.TextIOWrapper(io.BytesIO(data))
+
+
+def _write_records(input_file: TextIO, output: TextIO, reader: Any, writer: Any, converter: Optional[Converter], **writer_options: Any) -> None:
+    """Sends the records of input_file to the writer, or converts it with the converter if it's given"""
+    if converter:
+        converter(input_file, output)
+        return
+    fields, record_generator = reader.read(input_file)
+    write = writer.write(output, fields, **writer_options)
+    next(write)
+    for record in record_generator():
+        write.send(record)
+    write.close()
+
+
+def _count_records(path: str, start: int, end: int, reader: Any) -> int:
+    """
+    Returns the number of the records in the part of the file, runs in a worker process
+
+    The records are not parsed, their starts are counted in the bytes:
+    the lines that start with '>' in FASTA and the groups of 4 lines in FastQ, without the blank lines at the end
+    """
+    fastq = reader is FastQFile
+    count = 0
+    # FastQ: the number of the line breaks, those after the last non-blank character and whether there is one
+    line_breaks = 0
+    trailing_breaks = 0
+    has_content = False
+    # the part starts at the beginning of a line
+    previous = b"\n"
+    with open(path, mode='rb') as file:
+        file.seek(start)
+        remaining = end - start
+        while remaining:
+            block = file.read(min(_BOUNDARY_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            if fastq:
+                block_breaks = block.count(b"\n")
+                line_breaks += block_breaks
+                content = block.rstrip()
+                if content:
+                    has_content = True
+                    trailing_breaks = block.count(b"\n", len(content))
+                else:
+                    trailing_breaks += block_breaks
+            else:
+                # the last byte of the previous block can be the line break before '>'
+                count += (previous + block).count(b"\n>")
+                previous = block[-1:]
+    if fastq:
+        lines = line_breaks - trailing_breaks + 1 if has_content else 0
+        count = (lines + 3) // 4
+    return count
+
+
+def _sequence_lengths(path: str, start: int, end: int, reader: Any) -> Optional[Tuple[int, int]]:
+    """
+    Returns the minimal and the maximal length of the sequences in the part of the file, runs in a worker process
+
+    Returns None if the part has no records
+    """
+    _, record_generator = reader.read(_chunk_file(path, start, end))
+    lengths: Optional[Tuple[int, int]] = None
+    for record in record_generator():
+        length = len(record['sequence'])
+        if lengths is None:
+            lengths = (length, length)
+        elif not lengths[0] <= length <= lengths[1]:
+            lengths = (min(lengths[0], length), max(lengths[1], length))
+    return lengths
+
+
+def _declared_length(executor: ProcessPoolExecutor, path: str, chunks: List[Tuple[int, int]], reader: Any) -> Optional[int]:
+    """Returns the length of all the sequences in the file, or None if they have different lengths"""
+    parts = [lengths for lengths in executor.map(_sequence_lengths, *zip(*[(path, start, end, reader) for start, end in chunks]))
+             if lengths is not None]
+    if not parts:
+        return None
+    min_length = min(lengths[0] for lengths in parts)
+    max_length = max(lengths[1] for lengths in parts)
+    return max_length if min_length == max_length else None
+
+
+def _convert_chunk(path: str, start: int, end: int, output_path: str, reader: Any, writer: Any, converter: Optional[Converter], first_record: int) -> List[_Warning]:
+    """
+    Converts the part of the file into output_path, runs in a worker process
+
+    Returns the warnings, instead of raising them
+    """
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        with open(output_path, mode='w') as output:
+            if writer in _numbering_writers:
+                _write_records(_chunk_file(path, start, end), output, reader, writer, converter, first_record=first_record)
+            else:
+                _write_records(_chunk_file(path, start, end), output, reader, writer, converter)
+    return [(str(warning.message), warning.category) for warning in caught]
+
+
+def _set_automatic_renaming(disabled: bool) -> None:
+    """Copies the option of the conversion into a worker process, which runs only this conversion"""
+    utils.GLOBAL_OPTION_DISABLE_AUTOMATIC_RENAMING = disabled
+
+
+def convert_parallel(input_path: str, output_path: str, reader: Any, writer: Any, workers: Optional[int] = None, chunk_size: int = PARALLEL_CHUNK_SIZE, converter: Optional[Converter] = None) -> None:
+    """
+    Converts the file with the reader and writer methods of the format classes,
+    the parts of the file are converted in parallel
+
+    The file is split at the record boundaries into the parts of about chunk_size bytes,
+    every part is converted in a process of the pool and the outputs are concatenated in order.
+    The writers that number the records get the number of the records before their part,
+    so the output is the same as of the conversion of the whole file.
+    The writers that need all the records, like the Hapview one, convert the whole file in the current process.
+    If the file has several parts, the Hapview writer gets the length of the sequences, that is found in parallel,
+    when all of them have the same length.
+    workers is the number of processes, None means the number of CPUs.
+    converter, if given, converts each part instead of the reader and writer methods, it should be picklable.
+    It can't number the records or take the length of the sequences,
+    so with it only the writers that write each record independently split the file.
+    The warnings are raised once, in the order of their first appearance
+    """
+    if converter:
+        splittable = writer in _chunk_writers and writer not in _numbering_writers
+    else:
+        splittable = writer in _chunk_writers or writer in _length_writers
+    if splittable:
+        chunks = chunk_boundaries(input_path, reader, chunk_size)
+    else:
+        chunks = [(0, os.path.getsize(input_path))]
+
+    if writer in _length_writers and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            declared_length = _declared_length(executor, input_path, chunks, reader)
+        with open(input_path) as input_file, open(output_path, mode='w') as output:
+            _write_records(input_file, output, reader, writer, None, declared_length=declared_length)
+        return
+
+    if len(chunks) == 1:
+        with open(input_path) as input_file, open(output_path, mode='w') as output:
+            _write_records(input_file, output, reader, writer, converter)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_set_automatic_renaming,
+                             initargs=(utils.is_renaming_disabled(),)) as executor:
+        if writer in _numbering_writers:
+            # the first pass counts the records of each part
+            counts = executor.map(_count_records, *zip(*[(input_path, start, end, reader) for start, end in chunks]))
+            first_records = [0] + list(accumulate(counts))[:-1]
+        else:
+            first_records = [0] * len(chunks)
+
+        with tempfile.TemporaryDirectory(dir=os.path.dirname(output_path) or None) as workdir:
+            part_paths = [os.path.join(workdir, str(i)) for i in range(len(chunks))]
+            futures = [executor.submit(_convert_chunk, input_path, start, end, part_path, reader, writer, converter, first_record)
+                       for (start, end), part_path, first_record in zip(chunks, part_paths, first_records)]
+            # the first error in the file order is raised
+            part_warnings = [future.result() for future in futures]
+            with open(output_path, mode='wb') as output:
+                for part_path in part_paths:
+                    with open(part_path, mode='rb') as part:
+                        shutil.copyfileobj(part, output)
+
+    # the writers raise each warning once per part
+    raised: Dict[_Warning, None] = {}
+    for warnings_list in part_warnings:
+        raised.update(dict.fromkeys(warnings_list))
+    for message, category in raised:
+        warnings.warn(message, category)
@@ -0,0 +1,217 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Generator, IO, Iterator, List, Optional
+import functools
+import os
+import time
+from .columnar import RecordBatch
+
+# the profile of the conversion running in the current thread, None when it's not profiled
+_current_profile: ContextVar[Optional['ConversionProfile']] = ContextVar('current_profile', default=None)
+
+
+class StageStats():
+    """The cumulative time and the number of calls of one stage of the conversion"""
+
+    def __init__(self) -> None:
+        self.seconds = 0.0
+        self.calls = 0
+
+
+class ConversionProfile():
+    """
+    The measurements of one conversion
+
+    The reading and the writing are the top-level stages,
+    the name generation and the record preparation happen inside the writing and are included in its time.
+    The bytes are counted on the files given to the reader and the writer,
+    they are None if a file cannot tell its position
+    """
+
+    def __init__(self) -> None:
+        self.stages: Dict[str, StageStats] = {}
+        self.records_read = 0
+        self.records_written = 0
+        self.bytes_read: Optional[int] = 0
+        self.bytes_written: Optional[int] = 0
+        self.seconds = 0.0
+
+    def stage(self, name: str) -> StageStats:
+        try:
+            return self.stages[name]
+        except KeyError:
+            return self.stages.setdefault(name, StageStats())
+
+    def add(self, name: str, seconds: float) -> None:
+        """Adds one call of the given duration to the stage"""
+        stage = self.stage(name)
+        stage.seconds += seconds
+        stage.calls += 1
+
+    def report(self) -> Dict[str, Any]:
+        """Returns the measurements as a JSON-serializable dictionary"""
+        return {
+            'seconds': self.seconds,
+            'records_read': self.records_read,
+            'records_written': self.records_written,
+            'bytes_read': self.bytes_read,
+            'bytes_written': self.bytes_written,
+            'stages': {name: {'seconds': stats.seconds, 'calls': stats.calls} for name, stats in self.stages.items()},
+        }
+
+
+def current_profile() -> Optional[ConversionProfile]:
+    """Returns the profile of the conversion running in the current thread or None"""
+    return _current_profile.get()
+
+
+def _add_bytes(profile: ConversionProfile, attribute: str, start: Optional[int], end: Optional[int]) -> None:
+    if start is None or end is None or getattr(profile, attribute) is None:
+        setattr(profile, attribute, None)
+    else:
+        setattr(profile, attribute, getattr(profile, attribute) + end - start)
+
+
+def _position(file: IO) -> Optional[int]:
+    """Returns the position in the binary buffer of the file or None"""
+    try:
+        if file.writable():
+            file.flush()
+        return getattr(file, 'buffer', file).tell()
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def profiled_reader(read: Callable) -> Callable:
+    """
+    Decorator for the reader methods, that measures the reading stage of the profiled conversions
+
+    The conversions that are not profiled get the reader unchanged
+    """
+    @functools.wraps(read)
+    def wrapper(file: IO, *args: Any, **kwargs: Any) -> Any:
+        profile = _current_profile.get()
+        if profile is None:
+            return read(file, *args, **kwargs)
+        stage = profile.stage('read')
+        start_position = _position(file)
+        start = time.perf_counter()
+        fields, generator = read(file, *args, **kwargs)
+        stage.seconds += time.perf_counter() - start
+
+        def timed_generator() -> Iterator[Any]:
+            clock = time.perf_counter
+            iterator = generator()
+            while True:
+                start = clock()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    stage.seconds += clock() - start
+                    break
+                stage.seconds += clock() - start
+                stage.calls += 1
+                profile.records_read += len(item) if isinstance(item, RecordBatch) else 1
+                yield item
+            _add_bytes(profile, 'bytes_read', start_position, _position(file))
+        return fields, timed_generator
+    return wrapper
+
+
+def _timed_writer(writer: Generator, profile: ConversionProfile, file: IO) -> Generator:
+    """Passes the records to the writer and measures it"""
+    stage = profile.stage('write')
+    clock = time.perf_counter
+    start_position = _position(file)
+    start = clock()
+    next(writer)
+    stage.seconds += clock() - start
+    try:
+        while True:
+            try:
+                record = yield
+            except GeneratorExit:
+                break
+            start = clock()
+            writer.send(record)
+            stage.seconds += clock() - start
+            stage.calls += 1
+            profile.records_written += 1
+    finally:
+        start = clock()
+        writer.close()
+        stage.seconds += clock() - start
+        _add_bytes(profile, 'bytes_written', start_position, _position(file))
+
+
+def profiled_writer(write: Callable[..., Generator]) -> Callable[..., Generator]:
+    """
+    Decorator for the writer methods, that measures the writing stage of the profiled conversions
+
+    The conversions that are not profiled get the writer unchanged
+    """
+    @functools.wraps(write)
+    def wrapper(file: IO, fields: List[str], *args: Any, **kwargs: Any) -> Generator:
+        profile = _current_profile.get()
+        if profile is None:
+            return write(file, fields, *args, **kwargs)
+        return _timed_writer(write(file, fields, *args, **kwargs), profile, file)
+    return wrapper
+
+
+def timed(function: Callable, stage_name: str) -> Callable:
+    """
+    Returns the function that adds its calls to the stage of the current profile
+
+    The conversions that are not profiled get the function unchanged,
+    so it should be called when the conversion starts, like in the constructors of NameAssembler and Unicifier
+    """
+    profile = _current_profile.get()
+    if profile is None:
+        return function
+
+    @functools.wraps(function)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            profile.add(stage_name, time.perf_counter() - start)
+    return wrapper
+
+
+@contextmanager
+def profiled(enabled: bool = True, pstats_path: Optional[str] = None) -> Iterator[Optional[ConversionProfile]]:
+    """
+    Profiles the conversions in the block, returns their ConversionProfile
+
+    If enabled is False, nothing is measured and None is returned.
+    If pstats_path is given, the block also runs under cProfile and its statistics are saved there,
+    they can be read with pstats.Stats(pstats_path).
+    The conversions in the other threads are not affected
+    """
+    if not enabled:
+        yield None
+        return
+    profile = ConversionProfile()
+    token = _current_profile.set(profile)
+    if pstats_path:
+        # cProfile is needed only for the statistics, it's not imported with the readers and the writers
+        import cProfile
+        profiler: Optional[cProfile.Profile] = cProfile.Profile()
+    else:
+        profiler = None
+    start = time.perf_counter()
+    try:
+        if profiler:
+            profiler.enable()
+        try:
+            yield profile
+        finally:
+            if profiler:
+                profiler.disable()
+                os.makedirs(os.path.dirname(pstats_path) or os.curdir, exist_ok=True)
+                profiler.dump_stats(pstats_path)
+    finally:
+        profile.seconds = time.perf_counter() - start
+        _current_profile.reset(token)
@@ -1,13 +1,42 @@
-from .ext_ASCII_conv_table import ext_ascii_trans
-from typing import List, Callable, Optional, Dict, Any
+from typing import List, Callable, Optional, Dict, Any, TextIO, Iterator
 from .record import *
+from .profiling import current_profile, timed
+from contextlib import contextmanager
+from contextvars import ContextVar
 import re
 import warnings
-import unicodedata
+import functools
+import hashlib
+import time
+from array import array
 
-# read by lib.utils.Unicifier._unique_limit
+# read by lib.utils.Unicifier, when the conversion doesn't set the option with renaming_disabled
 GLOBAL_OPTION_DISABLE_AUTOMATIC_RENAMING = False
 
+# the option disable_automatic_renaming of the conversion running in the current thread, None if it's not set
+_renaming_disabled: ContextVar[Optional[bool]] = ContextVar('disable_automatic_renaming', default=None)
+
+
+@contextmanager
+def renaming_disabled(disabled: bool) -> Iterator[None]:
+    """
+    Sets the option disable_automatic_renaming for the conversions in the block
+
+    Unlike GLOBAL_OPTION_DISABLE_AUTOMATIC_RENAMING, the option applies only to the current thread,
+    so the concurrent conversions of a threaded server don't see each other's options
+    """
+    token = _renaming_disabled.set(disabled)
+    try:
+        yield
+    finally:
+        _renaming_disabled.reset(token)
+
+
+def is_renaming_disabled() -> bool:
+    """Returns the option disable_automatic_renaming of the current conversion"""
+    disabled = _renaming_disabled.get()
+    return GLOBAL_OPTION_DISABLE_AUTOMATIC_RENAMING if disabled is None else disabled
+
 
 class Aggregator:
     """Aggregates information about records
@@ -36,6 +65,36 @@ class Aggregator:
         return self._accs
 
 
+# the amount of characters collected by OutputBuffer before writing them
+OUTPUT_BUFFER_SIZE = 1 << 20
+
+
+class OutputBuffer:
+    """Collects the text written by a writer and writes it to the file in large chunks
+
+    write(text) adds the text to the buffer,
+    flush() writes the buffer into the file, it should be called after the last record
+    """
+
+    def __init__(self, file: TextIO, size: int = OUTPUT_BUFFER_SIZE):
+        self._file = file
+        self._size = size
+        self._parts: List[str] = []
+        self._length = 0
+
+    def write(self, text: str) -> None:
+        self._parts.append(text)
+        self._length += len(text)
+        if self._length >= self._size:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._parts:
+            self._file.write("".join(self._parts))
+            self._parts = []
+            self._length = 0
+
+
 def _max_reducer(acc: int, record: Record) -> int:
     """
     returns the maximum between acc and the length of sequence in record
@@ -55,22 +114,92 @@ def _min_reducer(acc: int, record: Record) -> int:
         return l
 
 
+# the number of sequence lengths that PhylipAggregator collects before reducing them
+LENGTH_BLOCK_SIZE = 1 << 16
+
+
 class PhylipAggregator(Aggregator):
     """
     Specialization of the Aggregator for the Phylip format
     with two default reducers
+
+    The two default reducers are not called for each record,
+    instead the sequence lengths are collected into an array and reduced in blocks
     """
 
     def __init__(self, *reducers: Any):
         super().__init__((0, _max_reducer), (None, _min_reducer), *reducers)
+        self._lengths = array('q')
+
+    def send(self, record: Record) -> None:
+        """ Send a record to collect its information
+        updates all the accumulators
+        """
+        self._lengths.append(len(record['sequence']))
+        if len(self._lengths) >= LENGTH_BLOCK_SIZE:
+            self._reduce_lengths()
+        for i in range(2, len(self._accs)):
+            self._accs[i] = self._reducers[i](self._accs[i], record)
+
+    def _reduce_lengths(self) -> None:
+        """ Applies the two default reducers to the collected lengths
+        """
+        lengths = self._lengths
+        if not lengths:
+            return
+        self._accs[0] = max(self._accs[0], max(lengths))
+        if 0 in lengths:
+            # _min_reducer starts again after a sequence of length 0
+            last_zero = len(lengths) - 1 - lengths[::-1].index(0)
+            rest = lengths[last_zero + 1:]
+            self._accs[1] = min(rest) if rest else 0
+        elif self._accs[1]:
+            self._accs[1] = min(self._accs[1], min(lengths))
+        else:
+            self._accs[1] = min(lengths)
+        self._lengths = array('q')
+
+    def results(self) -> List[Any]:
+        """ Returns the current values of the accumulators
+        """
+        self._reduce_lengths()
+        return self._accs
+
+
+# the maximal number of distinct strings remembered by sanitize
+SANITIZE_CACHE_SIZE = 1 << 16
+
+# matches sequences of not-alphanum characters
+_not_alphanum_regex = re.compile(r'[^a-zA-Z0-9]+')
+
+
+@functools.lru_cache(maxsize=None)
+def _ext_ascii_trans() -> Dict[int, str]:
+    """Returns the translation table of the extended ASCII characters, which is loaded only for non-ASCII strings"""
+    from .ext_ASCII_conv_table import ext_ascii_trans
+    return ext_ascii_trans
 
 
+@functools.lru_cache(maxsize=SANITIZE_CACHE_SIZE)
 def sanitize(s: str) -> str:
     """ replaces sequence of not-alphanum characters with '_'
     replaces some extended ASCII characters with ASCII representations
+
+    The results are cached, since the field values repeat a lot.
+    sanitize.cache_info() returns the hit and miss counters,
+    the profiled conversions measure only the misses
     """
-    s = unicodedata.normalize('NFKC', s).translate(ext_ascii_trans)
-    return '_'.join(part for part in (re.split(r'[^a-zA-Z0-9]+', s)) if part)
+    profile = current_profile()
+    start = time.perf_counter() if profile else 0.0
+    # ASCII strings are not changed by the normalization and the translation
+    if not s.isascii():
+        import unicodedata
+        s = unicodedata.normalize('NFKC', s).translate(_ext_ascii_trans())
+    # the sequences at the ends are removed, instead of being replaced
+    s = _not_alphanum_regex.sub('_', s).strip('_')
+    if profile:
+        profile.add('sanitize', time.perf_counter() - start)
+    return s
 
 
 class NameAssembler:
@@ -128,10 +257,10 @@ class NameAssembler:
                 i = fields.index('species')
                 fields[0], fields[i] = fields[i], fields[0]
             self._fields = fields
-            self.name = self._complex_name
+            self.name = timed(self._complex_name, 'NameAssembler.name')
         else:
             # copy the 'seqid'
-            self.name = self._simple_name
+            self.name = timed(self._simple_name, 'NameAssembler.name')
 
 
 def dna_aligner(max_length: int, min_length: int) -> Callable[[str], str]:
@@ -165,44 +294,157 @@ def get_species_field(fields: List[str]) -> Optional[str]:
     return next((field for field in field_names if field.casefold() in fields_set), None)
 
 
+# the initial number of slots of NameTable, a power of 2
+NAME_TABLE_SIZE = 1 << 10
+# the number of the first generated names that are checked for collisions by the limit-based Unicifier
+UNICIFIER_CHECKED_NAMES = 1 << 20
+
+
+class NameTable:
+    """
+    Compact set of names with a counter for each name
+
+    The names are stored encoded one after another in a bytearray,
+    and located by an open-addressing array of their 64-bit blake2b digests and their numbers,
+    which takes about the length of the name plus 32 bytes per name, instead of a dictionary entry with the string.
+    A name matches only if the stored name is the same, so the names with the same digest are kept apart.
+    The counters above 1 are kept in a dictionary, because most names are seen once
+    """
+
+    def __init__(self) -> None:
+        # the digests and the numbers of the names in the slots, the digest 0 marks the empty slots
+        self._hashes = array('q', bytes(8 * NAME_TABLE_SIZE))
+        self._numbers = array('q', bytes(8 * NAME_TABLE_SIZE))
+        self._mask = NAME_TABLE_SIZE - 1
+        # the encoded names and the offsets of their ends
+        self._names = bytearray()
+        self._ends = array('q')
+        # the counters of the names seen more than once, by the number of the name
+        self._repeated: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._ends)
+
+    @staticmethod
+    def _encode(name: str) -> bytes:
+        return name.encode('utf-8', errors='surrogatepass')
+
+    @staticmethod
+    def _key(encoded: bytes) -> int:
+        # the digest doesn't depend on the process, unlike hash(), 0 marks the empty slots
+        return int.from_bytes(hashlib.blake2b(encoded, digest_size=8).digest(), 'little', signed=True) or 1
+
+    def _name(self, number: int) -> bytes:
+        return self._names[self._ends[number - 1] if number else 0:self._ends[number]]
+
+    def _slot(self, key: int, encoded: bytes) -> int:
+        """Returns the slot of the name or the empty slot where it belongs"""
+        hashes = self._hashes
+        mask = self._mask
+        i = key & mask
+        # linear probing
+        while hashes[i] and (hashes[i] != key or self._name(self._numbers[i]) != encoded):
+            i = (i + 1) & mask
+        return i
+
+    def _grow(self) -> None:
+        """Doubles the number of slots"""
+        old_hashes, old_numbers = self._hashes, self._numbers
+        self._hashes = array('q', bytes(16 * len(old_hashes)))
+        self._numbers = array('q', bytes(16 * len(old_numbers)))
+        self._mask = mask = len(self._hashes) - 1
+        hashes = self._hashes
+        for key, number in zip(old_hashes, old_numbers):
+            if key:
+                # the stored names are all different, only an empty slot is searched
+                i = key & mask
+                while hashes[i]:
+                    i = (i + 1) & mask
+                hashes[i] = key
+                self._numbers[i] = number
+
+    def __contains__(self, name: str) -> bool:
+        encoded = self._encode(name)
+        return self._hashes[self._slot(self._key(encoded), encoded)] != 0
+
+    def increment(self, name: str) -> int:
+        """Increments the counter of the name and returns its previous value, which is 0 for the new names"""
+        encoded = self._encode(name)
+        key = self._key(encoded)
+        i = self._slot(key, encoded)
+        if self._hashes[i]:
+            number = self._numbers[i]
+            count = self._repeated.get(number, 1)
+            self._repeated[number] = count + 1
+            return count
+        self._hashes[i] = key
+        self._numbers[i] = len(self._ends)
+        self._names += encoded
+        self._ends.append(len(self._names))
+        # the load factor is kept at most 2/3, so the probe sequences stay short
+        if 3 * len(self._ends) > 2 * len(self._hashes):
+            self._grow()
+        return 0
+
+
 class Unicifier():
     """Takes care of making the names unique.
     Either overwrite the end with consecutive number, if given a length limit.
     Or keeps tracks on already seen names and prevents name collision by adding a number suffix
 
     use unique(self, name) method to generate a unique name based on the given one
+    The seen names are stored in NameTable.
+    With a length limit, the first UNICIFIER_CHECKED_NAMES generated names are checked for collisions,
+    which keeps the memory of the check bounded
     """
 
-    def __init__(self, length_limit: Optional[int] = None):
+    def __init__(self, length_limit: Optional[int] = None, start: int = 0):
+        """
+        start is the first number of the limit-based generation,
+        so a part of a file can be numbered as in the whole file
+        """
         if length_limit:
             # limit-based generation
             self._length_limit = length_limit
-            self._count = 0
-            self.unique = self._unique_limit
+            # the writers create the Unicifier when the conversion starts
+            self._renaming_disabled = is_renaming_disabled()
+            self._count = start
+            # the truncated names can coincide, so the generated names are checked
+            self._generated_names: Optional[NameTable] = NameTable()
+            self.unique = timed(self._unique_limit, 'Unicifier.unique')
         else:
             # memorization-bases generation
             self._sep = '_'
-            self._seen_name: Dict[str, int] = {}
-            self.unique = self._unique_set
+            self._seen_name = NameTable()
+            self.unique = timed(self._unique_set, 'Unicifier.unique')
+
+    def _check_collision(self, uniquename: str) -> None:
+        """Warns once, if the generated name has been generated before"""
+        generated_names = self._generated_names
+        if generated_names is None:
+            return
+        if generated_names.increment(uniquename):
+            warnings.warn(f"Some names are not unique within the limit of {self._length_limit} characters, for example {uniquename}")
+        elif len(generated_names) < UNICIFIER_CHECKED_NAMES:
+            return
+        # the check ends after the first collision or the checked names
+        self._generated_names = None
 
     def _unique_limit(self, name: str) -> str:
-        if GLOBAL_OPTION_DISABLE_AUTOMATIC_RENAMING:
-            return name[0:self._length_limit]
-        # overwrite the end with counter
-        suff = str(self._count)
-        self._count += 1
-        return name[0:self._length_limit - len(suff)] + suff
+        if self._renaming_disabled:
+            uniquename = name[0:self._length_limit]
+        else:
+            # overwrite the end with counter
+            suff = str(self._count)
+            self._count += 1
+            uniquename = name[0:self._length_limit - len(suff)] + suff
+        self._check_collision(uniquename)
+        return uniquename
 
     def _unique_set(self, name: str) -> str:
+        # the number of the previous occurrences of the name
+        count = self._seen_name.increment(name)
         # unless already seen, the result is the input
-        uniquename = name
-        try:
-            # try to generate the unique name based on the memorized ones
-            uniquename = name + self._sep + str(self._seen_name[name])
-        except KeyError:
-            # the name have not been seen before
-            self._seen_name[name] = 1
-        else:
-            # increment the amount the name have been seen
-            self._seen_name[name] += 1
-        return uniquename
+        if count:
+            return name + self._sep + str(count)
+        return name
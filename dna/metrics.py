@@ -0,0 +1,245 @@
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import atexit
+import json
+import math
+import os
+import threading
+import time
+
+
+# the environment variable with the directory, where the processes of a multi-process server share the metrics
+METRICS_DIR_VARIABLE = 'DNA_METRICS_DIR'
+# the upper bounds of the histogram buckets in seconds, the conversions can take minutes
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+# the changed samples are saved into the shared directory after this amount of seconds
+METRICS_SAVE_INTERVAL = 5.0
+
+# the labels of a sample, as sorted pairs of the name and the value
+Labels = Tuple[Tuple[str, str], ...]
+# the name and the labels of a sample
+_SampleKey = Tuple[str, Labels]
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_sample(name: str, labels: Labels, value: float) -> str:
+    if labels:
+        name += '{' + ','.join(f'{label}="{_escape(label_value)}"' for label, label_value in labels) + '}'
+    return f'{name} {_format_value(value)}'
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # exists, but belongs to another user
+        return True
+    return True
+
+
+class MetricsRegistry():
+    """
+    Counters, gauges and histograms in the Prometheus text exposition format
+
+    The updates are safe in multi-threaded servers.
+    If directory is given, each process saves its samples into its own file there every save_interval seconds,
+    and exposition() sums the samples of all the processes, so any process of the server can answer the scrape.
+    The files are named by the pid and the start time of the process, so a reused pid doesn't replace a file.
+    The processes that end without exiting normally, like the job workers, should call save() after their updates.
+    The counters and the histograms of the finished processes are kept, their gauges are dropped,
+    so the directory should be emptied when the server starts
+    """
+
+    def __init__(self, directory: Optional[str] = None, save_interval: float = METRICS_SAVE_INTERVAL):
+        self._directory = directory
+        self._save_interval = save_interval
+        self._lock = threading.Lock()
+        # serializes the writing of the file of the process
+        self._save_lock = threading.Lock()
+        # the type and the help text of the metrics by the name
+        self._descriptions: Dict[str, Tuple[str, str]] = {}
+        self._buckets: Dict[str, Tuple[float, ...]] = {}
+        # the functions that return the samples of the gauge at the time of the scrape
+        self._collectors: Dict[str, Callable[[], Iterable[Tuple[Labels, float]]]] = {}
+        self._values: Dict[_SampleKey, float] = {}
+        self._start_process()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            atexit.register(self.save)
+        # the child processes start with empty metrics, otherwise the parent's samples would be counted twice
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _start_process(self) -> None:
+        self._pid = os.getpid()
+        self._filename = f'{self._pid}-{time.time_ns()}.json'
+        # whether the samples have changed since the last save
+        self._changed = False
+        # the thread that saves the samples, started by the first update
+        self._saver: Optional[threading.Thread] = None
+
+    def _reset(self) -> None:
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._values = {}
+        self._start_process()
+
+    def counter(self, name: str, help: str) -> None:
+        self._descriptions[name] = ('counter', help)
+
+    def gauge(self, name: str, help: str, collect: Optional[Callable[[], Iterable[Tuple[Labels, float]]]] = None) -> None:
+        """Declares a gauge, whose samples are set with set() or returned by collect at the time of the scrape"""
+        self._descriptions[name] = ('gauge', help)
+        if collect:
+            self._collectors[name] = collect
+
+    def histogram(self, name: str, help: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self._descriptions[name] = ('histogram', help)
+        self._buckets[name] = tuple(sorted(buckets)) + (math.inf,)
+
+    @staticmethod
+    def labels(**labels: str) -> Labels:
+        return tuple(sorted(labels.items()))
+
+    def inc(self, name: str, labels: Labels = (), amount: float = 1.0) -> None:
+        """Increments the counter"""
+        with self._lock:
+            key = (name, labels)
+            self._values[key] = self._values.get(key, 0.0) + amount
+            self._update()
+
+    def set(self, name: str, labels: Labels, value: float) -> None:
+        """Sets the gauge"""
+        with self._lock:
+            self._values[(name, labels)] = value
+            self._update()
+
+    def observe(self, name: str, labels: Labels, value: float) -> None:
+        """Adds the value to the histogram"""
+        with self._lock:
+            # all the buckets are present, the counts are cumulative
+            for bound in self._buckets[name]:
+                key = (name + '_bucket', labels + (('le', _format_value(bound)),))
+                self._values[key] = self._values.get(key, 0.0) + (value <= bound)
+            for suffix, amount in (('_sum', value), ('_count', 1.0)):
+                key = (name + suffix, labels)
+                self._values[key] = self._values.get(key, 0.0) + amount
+            self._update()
+
+    def _update(self) -> None:
+        """Marks the samples as changed and starts the saving thread, called with the lock held"""
+        if not self._directory:
+            return
+        self._changed = True
+        if self._saver is None:
+            self._saver = threading.Thread(target=self._save_periodically, name='metrics-saver', daemon=True)
+            self._saver.start()
+
+    def _save_periodically(self) -> None:
+        while True:
+            time.sleep(self._save_interval)
+            self.save()
+
+    def save(self) -> None:
+        """Replaces the file of the process atomically, if the samples have changed since the last save"""
+        if not self._directory:
+            return
+        with self._save_lock:
+            with self._lock:
+                if not self._changed:
+                    return
+                self._changed = False
+                samples = [[name, labels, value] for (name, labels), value in self._values.items()]
+            path = os.path.join(self._directory, self._filename)
+            temp_path = path + '.tmp'
+            with open(temp_path, mode='w') as file:
+                json.dump(samples, file)
+            os.replace(temp_path, path)
+
+    def _samples(self) -> Dict[_SampleKey, float]:
+        """Returns the samples of all the processes"""
+        with self._lock:
+            samples = dict(self._values)
+        if not self._directory:
+            return samples
+        for filename in os.listdir(self._directory):
+            stem, _, extension = filename.partition('.')
+            pid_str, _, start_str = stem.partition('-')
+            if extension != 'json' or not pid_str.isdigit() or not start_str.isdigit() or filename == self._filename:
+                continue
+            # the other files with the pid of this process are left by the processes that had it before
+            alive = int(pid_str) != self._pid and _pid_alive(int(pid_str))
+            try:
+                with open(os.path.join(self._directory, filename)) as file:
+                    process_samples = json.load(file)
+            except (OSError, ValueError):
+                # the process has been removed, or is being written on a file system without atomic replace
+                continue
+            for name, labels, value in process_samples:
+                if not alive and self._descriptions.get(name, ('',))[0] == 'gauge':
+                    continue
+                key = (name, tuple(tuple(label) for label in labels))
+                samples[key] = samples.get(key, 0.0) + value
+        return samples
+
+    def _sample_order(self, key: _SampleKey) -> Tuple:
+        """Sorts the samples of a histogram by the labels and then by the bucket"""
+        name, labels = key
+        le = dict(labels).get('le')
+        other_labels = tuple(label for label in labels if label[0] != 'le')
+        return (other_labels, name, float(le.replace('+Inf', 'inf')) if le else 0.0)
+
+    def exposition(self) -> str:
+        """Returns the metrics in the Prometheus text exposition format"""
+        samples = self._samples()
+        for name, collect in self._collectors.items():
+            for labels, value in collect():
+                samples[(name, labels)] = value
+        by_metric: Dict[str, List[_SampleKey]] = {}
+        for key in samples:
+            name = key[0]
+            for suffix in ('_bucket', '_sum', '_count'):
+                if name.endswith(suffix) and self._descriptions.get(name[:-len(suffix)], ('',))[0] == 'histogram':
+                    name = name[:-len(suffix)]
+            by_metric.setdefault(name, []).append(key)
+        lines = []
+        for name in sorted(self._descriptions):
+            kind, help = self._descriptions[name]
+            lines.append(f'# HELP {name} {_escape(help)}')
+            lines.append(f'# TYPE {name} {kind}')
+            for key in sorted(by_metric.get(name, []), key=self._sample_order):
+                lines.append(_format_sample(key[0], key[1], samples[key]))
+        return '\n'.join(lines) + '\n'
+
+
+# the metrics of the conversion service
+registry = MetricsRegistry(os.environ.get(METRICS_DIR_VARIABLE))
+registry.counter('dna_http_requests_total', 'HTTP requests by the endpoint, the method and the status code')
+registry.histogram('dna_http_request_duration_seconds', 'Time to answer the HTTP requests by the endpoint')
+registry.counter('dna_conversions_total', 'Conversions by the input format, the output format and the result')
+registry.histogram('dna_conversion_duration_seconds', 'Time of the conversions by the input and the output format')
+registry.counter('dna_conversion_input_bytes_total', 'Size of the converted inputs by the input and the output format')
+registry.counter('dna_conversion_output_bytes_total', 'Size of the outputs by the input and the output format')
+registry.counter('dna_conversion_file_errors_total', 'Files that could not be converted by the input and the output format')
+
+
+def record_conversion(informat_name: Optional[str], outformat_name: Optional[str], seconds: float, input_bytes: int, output_bytes: int, error: bool, file_errors: int = 0) -> None:
+    """Records one conversion of the service, the formats should be known names to keep the number of the labels low"""
+    formats = registry.labels(informat=informat_name or 'auto', outformat=outformat_name or 'auto')
+    registry.inc('dna_conversions_total', formats + (('result', 'error' if error else 'success'),))
+    registry.observe('dna_conversion_duration_seconds', formats, seconds)
+    registry.inc('dna_conversion_input_bytes_total', formats, input_bytes)
+    registry.inc('dna_conversion_output_bytes_total', formats, output_bytes)
+    if file_errors:
+        registry.inc('dna_conversion_file_errors_total', formats, file_errors)
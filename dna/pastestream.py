@@ -0,0 +1,196 @@
+from typing import BinaryIO, Callable, Dict, Iterator, Optional
+import io
+import logging
+import tempfile
+import threading
+
+from dna.library.utils import renaming_disabled
+from dna.sniff import SNIFF_PREFIX_SIZE, format_mismatch, format_scores
+
+
+# the size of the chunks of the converted text passed to the response
+PASTE_STREAM_CHUNK_SIZE = 1 << 16
+# the size of the converted text, not yet taken by the client, that is kept in memory before moving it to disk
+PASTE_STREAM_SPOOL_SIZE = 16 << 20
+
+# called after the conversion with the number of the bytes read and written and the error or None
+OnFinish = Callable[[int, int, Optional[Exception]], None]
+
+
+class _PrefixedReader(io.RawIOBase):
+    """
+    Unseekable binary file with the already read prefix followed by the rest of the stream
+
+    It counts the bytes read
+    """
+
+    def __init__(self, prefix: bytes, stream: BinaryIO):
+        self._prefix = memoryview(prefix)
+        self._stream = stream
+        self.bytes_read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b: bytearray) -> int:
+        if self._prefix:
+            size = min(len(b), len(self._prefix))
+            b[:size] = self._prefix[:size]
+            self._prefix = self._prefix[size:]
+        else:
+            data = self._stream.read(len(b))
+            size = len(data)
+            b[:size] = data
+        self.bytes_read += size
+        return size
+
+
+class _SpooledPipe:
+    """
+    Passes the converted text from the conversion thread to the response
+
+    The writes never wait for the reader: the text that the client hasn't taken yet
+    is kept in a SpooledTemporaryFile, which moves to disk when it grows over PASTE_STREAM_SPOOL_SIZE.
+    So the conversion keeps reading the request body, even if the client sends the whole body
+    before it starts reading the response
+    """
+
+    def __init__(self) -> None:
+        self._spool = tempfile.SpooledTemporaryFile(max_size=PASTE_STREAM_SPOOL_SIZE)
+        self._condition = threading.Condition()
+        # the positions in the spool, where the reader and the writer continue
+        self._read_position = 0
+        self._write_position = 0
+        self._finished = False
+        self._error: Optional[Exception] = None
+        self._cancelled = False
+
+    def write(self, data: bytes) -> None:
+        """Appends the data, raises BrokenPipeError if the reader has stopped"""
+        with self._condition:
+            if self._cancelled:
+                raise BrokenPipeError("The response has been closed")
+            self._spool.seek(self._write_position)
+            self._spool.write(data)
+            self._write_position += len(data)
+            self._condition.notify()
+
+    def finish(self, error: Optional[Exception]) -> None:
+        """Marks the end of the text, the error is raised by the reader after the text"""
+        with self._condition:
+            self._finished = True
+            self._error = error
+            self._condition.notify()
+
+    def read(self, size: int) -> bytes:
+        """
+        Waits for the text and returns at most size bytes of it, b"" at the end
+
+        Raises the error of the conversion after the text
+        """
+        with self._condition:
+            while self._read_position == self._write_position and not self._finished:
+                self._condition.wait()
+            if self._read_position == self._write_position:
+                if self._error:
+                    raise self._error
+                return b""
+            self._spool.seek(self._read_position)
+            data = self._spool.read(min(size, self._write_position - self._read_position))
+            self._read_position += len(data)
+            if self._read_position == self._write_position:
+                # all the text has been taken, the spool is reused from the start
+                self._spool.seek(0)
+                self._spool.truncate()
+                self._read_position = self._write_position = 0
+            return data
+
+    def cancel(self) -> None:
+        """Stops the writer and releases the spool"""
+        with self._condition:
+            self._cancelled = True
+            self._spool.close()
+
+
+class _PipeWriter(io.RawIOBase):
+    """
+    Binary file, whose content is written into the pipe
+
+    Raises BrokenPipeError when the reader of the pipe stops
+    """
+
+    def __init__(self, pipe: _SpooledPipe):
+        self._pipe = pipe
+        self.bytes_written = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b: bytes) -> int:
+        self._pipe.write(bytes(b))
+        self.bytes_written += len(b)
+        return len(b)
+
+
+def _convert(body: _PrefixedReader, output: _PipeWriter, pipe: _SpooledPipe, informat_name: Optional[str], outformat_name: Optional[str], options: Dict[str, bool], on_finish: Optional[OnFinish]) -> None:
+    """
+    Converts the body into the output, runs in the conversion thread
+
+    The end of the output and the error are passed to the reader of the pipe, even if on_finish fails,
+    the exceptions of on_finish are logged
+    """
+    error: Optional[Exception] = None
+    try:
+        # the converter loads all the formats, it's imported by the first conversion
+        from dna.DNAconvert import convertDNA, parse_format
+        informat = parse_format(informat_name, ext_pair=("", ""))
+        outformat = parse_format(outformat_name, ext_pair=("", ""))
+        # the text is decoded incrementally, while the body is being read
+        with io.TextIOWrapper(io.BufferedReader(body, PASTE_STREAM_CHUNK_SIZE), encoding='utf-8') as infile, \
+                io.TextIOWrapper(io.BufferedWriter(output, PASTE_STREAM_CHUNK_SIZE), encoding='utf-8') as outfile:
+            with renaming_disabled(options['disable_automatic_renaming']):
+                convertDNA(infile, outfile, informat=informat, outformat=outformat, **options)
+    except Exception as e:
+        error = e
+    try:
+        if on_finish:
+            on_finish(body.bytes_read, output.bytes_written, error)
+    except Exception:
+        logging.getLogger(__name__).exception("on_finish of the paste conversion failed")
+    finally:
+        pipe.finish(error)
+
+
+def convert_paste_stream(stream: BinaryIO, informat_name: Optional[str], outformat_name: Optional[str], allow_empty_sequences: bool = False, disable_automatic_renaming: bool = False, on_finish: Optional[OnFinish] = None) -> Iterator[bytes]:
+    """
+    Converts the UTF-8 text read from the binary stream, returns iterator over the chunks of the converted text
+
+    Neither the input nor the output is kept whole in memory: the conversion runs in a thread,
+    which reads the stream as the converter needs it. The converted text not yet taken is spooled,
+    on disk when it's large, so the conversion never waits for the client.
+    Raises ValueError without converting, if the text is clearly not in the format informat_name.
+    The errors of the conversion are raised by the iterator, closing the iterator stops the conversion.
+    on_finish is called in the conversion thread, when the conversion ends
+    """
+    prefix = stream.read(SNIFF_PREFIX_SIZE)
+    mismatch = format_mismatch(format_scores(prefix.decode('utf-8', errors='replace'), len(prefix) < SNIFF_PREFIX_SIZE), informat_name)
+    if mismatch:
+        raise ValueError(mismatch)
+
+    pipe = _SpooledPipe()
+    options = {'allow_empty_sequences': allow_empty_sequences, 'disable_automatic_renaming': disable_automatic_renaming}
+    threading.Thread(target=_convert, daemon=True,
+                     args=(_PrefixedReader(prefix, stream), _PipeWriter(pipe), pipe,
+                           informat_name, outformat_name, options, on_finish)).start()
+
+    def converted_chunks() -> Iterator[bytes]:
+        try:
+            while True:
+                chunk = pipe.read(PASTE_STREAM_CHUNK_SIZE)
+                if not chunk:
+                    return
+                yield chunk
+        finally:
+            # stops the conversion, if the response is closed early
+            pipe.cancel()
+    return converted_chunks()
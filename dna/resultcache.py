@@ -0,0 +1,279 @@
+from typing import Any, Callable, Dict, List, Optional, TextIO, Tuple
+import functools
+import hashlib
+import json
+import os
+import shutil
+import struct
+import uuid
+
+try:
+    import fcntl
+except ImportError:
+    # Windows, the counters are updated without the lock
+    fcntl = None  # type: ignore
+
+
+# the total size of the cached outputs, the least recently used entries are removed above it
+RESULT_CACHE_SIZE = 1 << 30
+# the fraction of the maximal size that is left by the eviction, so it doesn't run on each following store
+EVICTION_TARGET = 0.9
+# the amount of bytes hashed at once
+HASH_CHUNK_SIZE = 1 << 20
+
+# the warnings of the cached conversion
+_WARNINGS_FILE = 'warnings.json'
+# the numbers of the hits and the misses and the size of the entries,
+# updated under a lock by all the processes that share the cache
+_COUNTERS_FILE = 'counters'
+_COUNTERS = struct.Struct('<qqq')
+_HITS = 0
+_MISSES = 1
+_SIZE = 2
+# locked by the process that evicts the entries
+_EVICTION_LOCK_FILE = 'evicting'
+
+# the modules whose changes can change the outputs, relative to the directory of this module
+_CONVERTER_SOURCES = ('library', 'DNAconvert.py')
+
+
+@functools.lru_cache(maxsize=None)
+def converter_version() -> str:
+    """
+    Returns the digest of the source of the converter, it's a part of the cache keys
+
+    So the outputs cached by a different version of the converter are not used after an upgrade
+    """
+    digest = hashlib.sha256()
+    base = os.path.dirname(os.path.abspath(__file__))
+    paths = []
+    for source in _CONVERTER_SOURCES:
+        path = os.path.join(base, source)
+        if os.path.isdir(path):
+            paths.extend(os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith('.py'))
+        else:
+            paths.append(path)
+    for path in paths:
+        try:
+            with open(path, mode='rb') as source_file:
+                content = source_file.read()
+        except OSError:
+            continue
+        digest.update(os.path.relpath(path, base).encode('utf-8') + b'\0' + content)
+    return digest.hexdigest()
+
+
+def hash_file(path: str) -> str:
+    """Returns the hex sha256 digest of the file's content"""
+    digest = hashlib.sha256()
+    with open(path, mode='rb') as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_text_file(file: TextIO) -> str:
+    """Returns the hex sha256 digest of the rest of the text file encoded in utf-8"""
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), ''):
+        digest.update(chunk.encode('utf-8', errors='surrogatepass'))
+    return digest.hexdigest()
+
+
+def _entry_size(path: str) -> int:
+    """Returns the size of the files in the entry's directory"""
+    return sum(output.stat().st_size for output in os.scandir(path))
+
+
+def _link_or_copy(source: str, destination: str) -> None:
+    try:
+        os.link(source, destination)
+    except OSError:
+        # hard links are not possible across file systems
+        shutil.copyfile(source, destination)
+
+
+class ResultCache():
+    """
+    Directory with the outputs of the previous conversions
+
+    The entries are keyed by the digest of the input and the conversion options,
+    so a repeated conversion costs only hashing the input and linking the outputs.
+    Each entry is a directory with the outputs and their warnings, its modification time is the time of the last use.
+    The size of the entries is counted by the stores, the entries are listed only when it exceeds max_size.
+    The cache is shared by all processes that use the same directory
+    """
+
+    def __init__(self, root: str, max_size: int = RESULT_CACHE_SIZE):
+        self.root = root
+        self.max_size = max_size
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def key(content_digest: str, informat_name: Optional[str], outformat_name: Optional[str], allow_empty_sequences: bool, disable_automatic_renaming: bool, filename: str = '') -> str:
+        """
+        Returns the key of the conversion of the input with the given digest
+
+        The filename should be given if the names of the outputs depend on it.
+        The key includes the version of the converter
+        """
+        parameters = json.dumps([converter_version(), content_digest, informat_name, outformat_name,
+                                 allow_empty_sequences, disable_automatic_renaming, filename])
+        return hashlib.sha256(parameters.encode('utf-8')).hexdigest()
+
+    def _read_counters(self, fd: int) -> Tuple[List[int], bool]:
+        """Returns the counters and whether the file contains all of them, the missing ones are 0"""
+        os.lseek(fd, 0, os.SEEK_SET)
+        data = os.read(fd, _COUNTERS.size)
+        complete = len(data) == _COUNTERS.size
+        # the files of the older versions don't have the size
+        data = data[:len(data) - len(data) % 8].ljust(_COUNTERS.size, b'\0')
+        return list(_COUNTERS.unpack(data)), complete
+
+    def _update_counters(self, update: Callable[[List[int]], None]) -> Tuple[List[int], bool]:
+        """
+        Changes the counters in the counters file, which keeps its size
+
+        Returns the changed counters and whether the file contained all of them before
+        """
+        fd = os.open(os.path.join(self.root, _COUNTERS_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl:
+                fcntl.lockf(fd, fcntl.LOCK_EX)
+            counters, complete = self._read_counters(fd)
+            update(counters)
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.write(fd, _COUNTERS.pack(*counters))
+            return counters, complete
+        finally:
+            # closing releases the lock
+            os.close(fd)
+
+    def _count(self, counter: int, amount: int = 1) -> Tuple[List[int], bool]:
+        """Adds the amount to the counter"""
+        def add(counters: List[int]) -> None:
+            counters[counter] += amount
+        return self._update_counters(add)
+
+    def lookup(self, key: str, output_dir: str) -> Optional[List[str]]:
+        """
+        Links the cached outputs of the conversion into output_dir
+
+        Returns the warnings of the cached conversion or None, if it's not in the cache
+        """
+        path = os.path.join(self.root, key)
+        try:
+            with open(os.path.join(path, _WARNINGS_FILE)) as warnings_file:
+                warnings = json.load(warnings_file)
+            outputs = [name for name in os.listdir(path) if name != _WARNINGS_FILE]
+            for name in outputs:
+                _link_or_copy(os.path.join(path, name), os.path.join(output_dir, name))
+            # the entry becomes the most recently used
+            os.utime(path)
+        except (OSError, ValueError):
+            # not cached or removed by another process meanwhile
+            self._count(_MISSES)
+            return None
+        self._count(_HITS)
+        return warnings
+
+    def store(self, key: str, output_dir: str, warnings: List[str]) -> None:
+        """
+        Puts the outputs in output_dir and their warnings into the cache, then removes the least recently used entries
+        """
+        # the entry is prepared under a temporary name, so it appears complete
+        temp_path = os.path.join(self.root, f'tmp-{uuid.uuid4().hex}')
+        os.mkdir(temp_path)
+        try:
+            for name in os.listdir(output_dir):
+                _link_or_copy(os.path.join(output_dir, name), os.path.join(temp_path, name))
+            with open(os.path.join(temp_path, _WARNINGS_FILE), mode='w') as warnings_file:
+                json.dump(warnings, warnings_file)
+            path = os.path.join(self.root, key)
+            os.rename(temp_path, path)
+            size = _entry_size(path)
+        except OSError:
+            # the same conversion was stored by another process
+            shutil.rmtree(temp_path, ignore_errors=True)
+            return
+        counters, complete = self._count(_SIZE, size)
+        if counters[_SIZE] > self.max_size or not complete:
+            # the size of the entries is unknown in the cache created by an older version
+            self.evict()
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        """Returns the last use, the size and the path of each entry"""
+        entries = []
+        for entry in os.scandir(self.root):
+            if not entry.is_dir() or entry.name.startswith('tmp-'):
+                continue
+            try:
+                entries.append((entry.stat().st_mtime, _entry_size(entry.path), entry.path))
+            except OSError:
+                # removed by another process
+                continue
+        return entries
+
+    def evict(self) -> None:
+        """
+        Removes the least recently used entries, if the cache doesn't fit into max_size,
+        until it fits into EVICTION_TARGET of max_size
+
+        The counted size is set to the size of the remaining entries,
+        the entries stored by the other processes meanwhile are added to it
+        """
+        fd = os.open(os.path.join(self.root, _EVICTION_LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl:
+                try:
+                    fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    # another process is evicting
+                    return
+            counted_size = self._counters()[_SIZE]
+            entries = sorted(self._entries())
+            total_size = sum(size for _, size, _ in entries)
+            if total_size > self.max_size:
+                for _, size, path in entries:
+                    if total_size <= self.max_size * EVICTION_TARGET:
+                        break
+                    shutil.rmtree(path, ignore_errors=True)
+                    total_size -= size
+
+            def set_size(counters: List[int]) -> None:
+                counters[_SIZE] += total_size - counted_size
+            self._update_counters(set_size)
+        finally:
+            # closing releases the lock
+            os.close(fd)
+
+    def _counters(self) -> List[int]:
+        try:
+            fd = os.open(os.path.join(self.root, _COUNTERS_FILE), os.O_RDONLY)
+        except OSError:
+            return [0, 0, 0]
+        try:
+            if fcntl:
+                fcntl.lockf(fd, fcntl.LOCK_SH)
+            return self._read_counters(fd)[0]
+        finally:
+            os.close(fd)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the statistics of the cache:
+            hits, misses: the number of the lookups that found or didn't find the conversion
+            hit_rate: the fraction of the lookups that were hits
+            entries: the number of the cached conversions
+            size, max_size: the size of the cached outputs and its limit in bytes
+        """
+        hits, misses, _ = self._counters()
+        entries = self._entries()
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+            'entries': len(entries),
+            'size': sum(size for _, size, _ in entries),
+            'max_size': self.max_size,
+        }
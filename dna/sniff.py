@@ -0,0 +1,170 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import re
+import threading
+
+from dna.library.compression import MAGIC_SIZE, detect_compression, open_decompressed
+
+
+# the formats that can be detected, in the order of preference for equal scores
+SNIFF_FORMATS = ('tab', 'fasta', 'tab_noheaders', 'relaxed_phylip', 'phylip',
+                 'fastq', 'nexus', 'genbank', 'fasta_gbexport', 'moid_fas')
+# the amount of bytes at the beginning of a file that is inspected
+SNIFF_PREFIX_SIZE = 64 << 10
+# the number of detection results that are remembered
+SNIFF_CACHE_SIZE = 1024
+# a conversion is refused only if another format is detected at least with this confidence
+SNIFF_MIN_CONFIDENCE = 0.8
+
+# the first line of a Phylip file: the number of sequences and their length
+_phylip_header_regex = re.compile(r'\s*\d+\s+\d+\s*')
+# a field of the Genbank FASTA header: [name=value]
+_genbank_field_regex = re.compile(r'\[[^]=]+=')
+
+# format scores by the digest of the prefix
+_cache: 'OrderedDict[str, Dict[str, float]]' = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _prefix_lines(prefix: str, complete: bool) -> List[str]:
+    """
+    Returns the non-empty lines of the prefix
+
+    If the prefix is not the whole file, its last line is incomplete and is dropped
+    """
+    lines = prefix.splitlines()
+    if not complete and len(lines) > 1:
+        lines.pop()
+    return [line for line in lines if line.strip()]
+
+
+def _fasta_scores(lines: List[str]) -> Dict[str, float]:
+    headers = [line for line in lines if line.startswith('>')]
+    genbank = all(_genbank_field_regex.search(header) for header in headers)
+    moid = all('|' in header for header in headers)
+    # every FASTA variant can be read as plain FASTA
+    return {
+        'fasta': 0.6 if genbank or moid else 0.9,
+        'fasta_gbexport': 0.95 if genbank else 0.3,
+        'moid_fas': 0.9 if moid else 0.3,
+    }
+
+
+def _fastq_scores(lines: List[str]) -> Dict[str, float]:
+    if len(lines) >= 4 and lines[2].startswith('+') and len(lines[1]) == len(lines[3]):
+        return {'fastq': 1.0}
+    return {'fastq': 0.5}
+
+
+def _phylip_scores(lines: List[str]) -> Dict[str, float]:
+    # the strict Phylip format allows at most 10 characters in the names
+    names = [line.split(maxsplit=1)[0] for line in lines[1:]]
+    if any(len(name) > 10 for name in names):
+        return {'relaxed_phylip': 0.95, 'phylip': 0.2}
+    return {'phylip': 0.9, 'relaxed_phylip': 0.85}
+
+
+def _tab_scores(lines: List[str]) -> Dict[str, float]:
+    header = [field.strip().casefold() for field in lines[0].split('\t')]
+    if 'sequence' in header:
+        return {'tab': 0.95, 'tab_noheaders': 0.3}
+    return {'tab_noheaders': 0.9, 'tab': 0.3}
+
+
+def format_scores(prefix: str, complete: bool = False) -> Dict[str, float]:
+    """
+    Returns the confidence, between 0 and 1, that the text starting with prefix is in each of SNIFF_FORMATS
+
+    complete means that the prefix is the whole text.
+    A score of 0 means that the text cannot be in the format
+    """
+    scores = dict.fromkeys(SNIFF_FORMATS, 0.0)
+    lines = _prefix_lines(prefix, complete)
+    if not lines:
+        return scores
+    first = lines[0].lstrip('\ufeff')
+    if first.casefold().startswith('#nexus'):
+        scores['nexus'] = 1.0
+    elif first.startswith('LOCUS'):
+        scores['genbank'] = 1.0
+    elif first.startswith('>'):
+        scores.update(_fasta_scores(lines))
+    elif first.startswith('@'):
+        scores.update(_fastq_scores(lines))
+    elif _phylip_header_regex.fullmatch(first):
+        scores.update(_phylip_scores(lines))
+    elif '\t' in first:
+        scores.update(_tab_scores(lines))
+    return scores
+
+
+def best_format(scores: Dict[str, float]) -> Tuple[Optional[str], float]:
+    """
+    Returns the most probable format according to the scores of format_scores and its confidence
+
+    The format is None if the text is not in any of SNIFF_FORMATS
+    """
+    # max returns the first of the equal scores
+    best = max(SNIFF_FORMATS, key=scores.__getitem__)
+    if not scores[best]:
+        return None, 0.0
+    return best, scores[best]
+
+
+def sniff_text(text: str) -> Dict[str, float]:
+    """
+    Returns the format scores of the text, only its first SNIFF_PREFIX_SIZE characters are inspected
+    """
+    return format_scores(text[:SNIFF_PREFIX_SIZE], len(text) <= SNIFF_PREFIX_SIZE)
+
+
+def sniff_file(path: str) -> Dict[str, float]:
+    """
+    Returns the format scores of the file
+
+    Only the first SNIFF_PREFIX_SIZE bytes are read, of the decompressed content for the compressed files.
+    The scores are cached by the digest of these bytes, so repeated uploads of the same file are not inspected again
+    """
+    with open(path, mode='rb') as file:
+        data = file.read(SNIFF_PREFIX_SIZE + 1)
+        compression = detect_compression(data[:MAGIC_SIZE])
+        if compression:
+            # the compressed files are inspected by their content
+            file.seek(0)
+            try:
+                with open_decompressed(file, compression) as content:
+                    data = content.read(SNIFF_PREFIX_SIZE + 1)
+            except Exception:
+                # corrupted files are left to the conversion
+                data = b''
+    complete = len(data) <= SNIFF_PREFIX_SIZE
+    data = data[:SNIFF_PREFIX_SIZE]
+    digest = hashlib.sha256(data).hexdigest()
+    with _cache_lock:
+        if digest in _cache:
+            _cache.move_to_end(digest)
+            return dict(_cache[digest])
+    # a character can be cut at the end of the prefix
+    scores = format_scores(data.decode('utf-8', errors='replace'), complete)
+    with _cache_lock:
+        _cache[digest] = scores
+        if len(_cache) > SNIFF_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return dict(scores)
+
+
+def format_mismatch(scores: Dict[str, float], informat_name: Optional[str]) -> Optional[str]:
+    """
+    Returns the error message, if the input with the given format scores cannot be in the format informat_name, or None
+
+    The input is refused only if informat_name is ruled out
+    and another format is detected with confidence at least SNIFF_MIN_CONFIDENCE.
+    Unknown format names are never refused
+    """
+    if informat_name not in SNIFF_FORMATS or scores[informat_name]:
+        return None
+    detected_format, confidence = best_format(scores)
+    if detected_format is None or confidence < SNIFF_MIN_CONFIDENCE:
+        return None
+    return f"The input looks like {detected_format} rather than {informat_name}"
@@ -0,0 +1,120 @@
+from typing import BinaryIO, Iterator, List, Optional, Union
+import io
+
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+from werkzeug.utils import secure_filename
+
+from dna.batch import FileResult, convert_stream
+
+
+# the amount of bytes read at once from the request body
+UPLOAD_STREAM_CHUNK_SIZE = 1 << 16
+
+_Event = Union[Field, File, Data]
+
+
+def _multipart_events(stream: BinaryIO, boundary: bytes) -> Iterator[_Event]:
+    """
+    Returns iterator over the events of the multipart body, which is read from the stream as the events are needed
+    """
+    decoder = MultipartDecoder(boundary)
+    while True:
+        event = decoder.next_event()
+        if isinstance(event, NeedData):
+            # None signals the end of the body
+            decoder.receive_data(stream.read(UPLOAD_STREAM_CHUNK_SIZE) or None)
+        elif isinstance(event, Epilogue):
+            return
+        elif isinstance(event, (Field, File, Data)):
+            yield event
+
+
+class _PartReader(io.RawIOBase):
+    """
+    Unseekable binary file with the content of one part of the multipart body
+
+    It takes the Data events of the part from the shared iterator,
+    so the following events are available only after the part is read to the end
+    """
+
+    def __init__(self, events: Iterator[_Event]):
+        self._events = events
+        self._data = memoryview(b'')
+        self._more_data = True
+
+    def readable(self) -> bool:
+        return True
+
+    def _next_data(self) -> Data:
+        """Returns the next Data event of the part, raises ValueError if the body ends before the part"""
+        try:
+            event = next(self._events)
+        except StopIteration:
+            raise ValueError("The upload ended in the middle of the file") from None
+        assert isinstance(event, Data)
+        return event
+
+    def readinto(self, b: bytearray) -> int:
+        while not self._data and self._more_data:
+            event = self._next_data()
+            self._data = memoryview(event.data)
+            self._more_data = event.more_data
+        size = min(len(b), len(self._data))
+        b[:size] = self._data[:size]
+        self._data = self._data[size:]
+        return size
+
+    def peek(self, size: int) -> bytes:
+        """Returns the next size bytes of the part, or the rest of the part, without consuming them"""
+        if len(self._data) < size and self._more_data:
+            chunks = [bytes(self._data)]
+            length = len(self._data)
+            while length < size and self._more_data:
+                event = self._next_data()
+                chunks.append(event.data)
+                length += len(event.data)
+                self._more_data = event.more_data
+            self._data = memoryview(b''.join(chunks))
+        return bytes(self._data[:size])
+
+    def drain(self) -> None:
+        """Skips the rest of the part, also after the reader is closed"""
+        self._data = memoryview(b'')
+        while self._more_data:
+            self._more_data = self._next_data().more_data
+
+
+def convert_multipart(stream: BinaryIO, boundary: str, output_dir: str, informat_name: Optional[str], outformat_name: Optional[str], allow_empty_sequences: bool = False, disable_automatic_renaming: bool = False, field_name: str = 'files[]', profile: bool = False, pstats_dir: Optional[str] = None) -> List[FileResult]:
+    """
+    Converts the files of the multipart body into output_dir while the body is being read,
+    each file is converted when it has arrived
+
+    Only the files in the field field_name are converted, the other parts are skipped.
+    The uploaded files are not saved in output_dir, each one is kept in a temporary directory during its conversion.
+    If the body ends in the middle of a file, the file gets the error and the following files are lost.
+    profile and pstats_dir are the same as in dna.batch.convert_stream.
+    Returns the results in the order of the files
+    """
+    results = []
+    events = _multipart_events(stream, boundary.encode('ascii'))
+    for event in events:
+        part = _PartReader(events)
+        filename = secure_filename(event.filename or '') if isinstance(event, File) and event.name == field_name else ''
+        result: Optional[FileResult] = None
+        try:
+            if filename:
+                result = convert_stream(part, filename, output_dir, informat_name, outformat_name,
+                                        allow_empty_sequences=allow_empty_sequences,
+                                        disable_automatic_renaming=disable_automatic_renaming,
+                                        profile=profile, pstats_dir=pstats_dir)
+                results.append(result)
+            # the next event is after the end of the part, even if the conversion stopped early
+            part.drain()
+        except ValueError as e:
+            # the body is truncated or malformed, there are no more parts
+            if result:
+                result.error = result.error or str(e)
+            elif filename:
+                results.append(FileResult(filename, error=str(e)))
+            break
+    return results
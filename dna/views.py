@@ -1,42 +1,246 @@
 from dna import app
 from flask import render_template, redirect, url_for, flash, request
-from flask_wtf.file import FileAllowed, FileRequired
-from flask import Flask, send_from_directory, render_template, request, redirect, url_for, g, flash, send_file
-from wtforms.widgets import Input
-from werkzeug.utils import secure_filename, escape, unescape
-from markupsafe import Markup
+from flask import Flask, send_from_directory, render_template, request, redirect, url_for, g, flash, send_file, Response, stream_with_context, session, jsonify, abort
+from werkzeug.utils import secure_filename
+import io
 import os
-from collections import defaultdict
+import itertools
+from dataclasses import asdict
 import shutil
-from dna.DNAconvert import *
+import tempfile
+import time
+from dna.zipstream import zip_directory
+from dna.workspace import Workspace, cleanup_workspaces
+from dna.batch import paste_convert
+from dna.jobs import count_jobs, read_status, submit_paste_job, submit_upload_job
+from dna.metrics import record_conversion, registry
+from dna.resultcache import RESULT_CACHE_SIZE, ResultCache
+from dna.uploadstream import convert_multipart
+from dna.pastestream import convert_paste_stream
 
 
 basedir = os.path.abspath(os.path.dirname(__file__))
 
-context= {'status': False, 'name': False, 'extra': False, 'starting': True}
-options= defaultdict(lambda: None)
+input_formats= ['tab', 'fasta', 'tab_noheaders', 'relaxed_phylip', 'phylip', 'fastq', 'nexus', 'genbank', 'fasta_gbexport', 'moid_fas']
+output_formats= ['tab', 'fasta', 'tab_noheaders', 'relaxed_phylip', 'phylip', 'fastq', 'nexus', 'fasta_gbexport', 'moid_fas']
+
+
+def new_context():
+    """
+    Returns the template context of one request
+
+    The context is not shared between requests, so concurrent requests don't overwrite it
+    """
+    return {'status': False, 'name': False, 'extra': False, 'starting': True, 'names': input_formats, 'outputs': output_formats, 'profiles': {}}
+
+
+def new_options():
+    """
+    Returns the conversion options of one request
+    """
+    return {'allow_empty_sequences': False, 'disable_automatic_renaming': False}
+
+
+def workspace_root():
+    """
+    Returns the directory that contains the workspaces of the jobs
+    """
+    return app.config.get('workspaces') or os.path.join(tempfile.gettempdir(), 'dnaconvert')
+
+
+def result_cache():
+    """
+    Returns the cache of the conversion results, shared by all sessions
+    """
+    return ResultCache(app.config.get('result_cache') or os.path.join(workspace_root(), 'cache'),
+                       app.config.get('result_cache_size', RESULT_CACHE_SIZE))
+
+
+def format_label(name, formats):
+    """
+    Returns the format name for the metrics labels, the unknown names are 'other' to keep the number of the labels low
+    """
+    return name if name in formats else 'other'
+
+
+def directory_size(path):
+    """
+    Returns the total size of the files in the directory
+    """
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+
+def job_states():
+    """
+    Returns the samples of the job queue gauge
+    """
+    return [(registry.labels(state= state), count) for state, count in count_jobs(workspace_root()).items()]
+
+
+registry.gauge('dna_jobs', 'Background jobs in the workspaces by the state, queued jobs are the depth of the queue', job_states)
+
+
+@app.before_request
+def start_timer():
+    g.request_start= time.perf_counter()
+
+
+@app.after_request
+def record_request(response):
+    """
+    Counts the request and measures its latency
+    """
+    endpoint= request.endpoint or 'unknown'
+    registry.inc('dna_http_requests_total', registry.labels(endpoint= endpoint, method= request.method, status= str(response.status_code)))
+    if 'request_start' in g:
+        registry.observe('dna_http_request_duration_seconds', registry.labels(endpoint= endpoint), time.perf_counter() - g.request_start)
+    return response
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Returns the metrics of the service in the Prometheus text exposition format, see dna.metrics
+    """
+    return Response(registry.exposition(), mimetype='text/plain; version=0.0.4')
+
+
+def profiling_options(workspace):
+    """
+    Returns the profiling arguments of the conversions in the workspace
+
+    The conversions are profiled if the configuration option profile_conversions is set,
+    the cProfile statistics are saved in the workspace, if the option profile_pstats is set
+    """
+    return {'profile': bool(app.config.get('profile_conversions')),
+            'pstats_dir': workspace.pstats_dir if app.config.get('profile_pstats') else None}
+
+
+def current_workspace():
+    """
+    Returns the workspace of the last job of the session or None
+    """
+    return Workspace.open(workspace_root(), session.get('job'))
+
+
+def new_workspace():
+    """
+    Creates a workspace for a new job of the session
+
+    The previous workspace of the session and the expired workspaces are removed
+    """
+    clear()
+    cleanup_workspaces(workspace_root())
+    workspace= Workspace.create(workspace_root())
+    session['job']= workspace.job_id
+    return workspace
+
+
+def send_result(workspace):
+    """
+    Returns the response with the converted files of the workspace
+    """
+    if os.path.exists(workspace.result_file):
+        return send_file(workspace.result_file, as_attachment=True)
+    if os.path.isdir(workspace.result_dir):
+        # the archive is compressed while it is being sent
+        return Response(stream_with_context(zip_directory(workspace.result_dir)), mimetype='application/zip',
+                        headers={'Content-Disposition': 'attachment; filename=output.zip'})
+    abort(404)
+
 
 @app.route('/download', methods=['GET', 'POST'])
 def download():
-    if context['status']:
-        file = os.path.join(app.config['output'], 'result.txt')
-        return send_file(file, as_attachment=True)
-    if context['name']:
-        file = os.path.join(basedir, 'output.zip')
-        return send_file(file, as_attachment=True)
+    workspace= current_workspace()
+    if workspace is None:
+        flash('The converted files are not available anymore')
+        return render_template('error.html')
+    return send_result(workspace)
+
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """
+    Starts a background conversion of the uploaded files or the pasted content
+
+    Takes the same form fields as /upload or /paste.
+    Returns the job id with the status and the result urls
+    """
+    cleanup_workspaces(workspace_root())
+    workspace= Workspace.create(workspace_root())
+    options= new_options()
+    try:
+        if 'content' in request.form:
+            input_format= request.form['p1']
+            output_format= request.form['p2']
+            if request.form.get('p3'):
+                options['allow_empty_sequences'] = True
+            if request.form.get('p4'):
+                options['disable_automatic_renaming'] = True
+            with open(workspace.input_file, mode="w") as input_file:
+                input_file.write(request.form['content'])
+            submit_paste_job(workspace, input_format, output_format, options, job_workers= app.config.get('job_workers'), cache= result_cache(), **profiling_options(workspace),
+                             metrics_formats= (format_label(input_format, input_formats), format_label(output_format, output_formats)))
+        else:
+            input_format= request.form['u1']
+            output_format= request.form['u2']
+            if request.form.get('u3'):
+                options['allow_empty_sequences'] = True
+            if request.form.get('u4'):
+                options['disable_automatic_renaming'] = True
+            os.mkdir(workspace.input_dir)
+            for file in request.files.getlist('files[]'):
+                if file and file.filename:
+                    file.save(os.path.join(workspace.input_dir, secure_filename(file.filename)))
+            submit_upload_job(workspace, input_format, output_format, options, job_workers= app.config.get('job_workers'), cache= result_cache(), **profiling_options(workspace),
+                              metrics_formats= (format_label(input_format, input_formats), format_label(output_format, output_formats)))
+    except Exception as e:
+        workspace.cleanup()
+        return jsonify(error= str(e)), 400
+    return jsonify(job= workspace.job_id, status= url_for('job_status', job_id= workspace.job_id), result= url_for('job_result', job_id= workspace.job_id)), 202
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """
+    Returns the status of the job, see dna.jobs.read_status
+    """
+    workspace= Workspace.open(workspace_root(), job_id)
+    status= workspace and read_status(workspace)
+    if not status:
+        return jsonify(error= 'unknown job'), 404
+    return jsonify(status)
+
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    """
+    Returns the converted files of a finished job
+    """
+    workspace= Workspace.open(workspace_root(), job_id)
+    status= workspace and read_status(workspace)
+    if not status:
+        return jsonify(error= 'unknown job'), 404
+    if status['state'] != 'done':
+        return jsonify(status), 409
+    return send_result(workspace)
+
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """
+    Returns the hit rate and the size of the conversion result cache, see dna.resultcache.ResultCache.stats
+    """
+    return jsonify(result_cache().stats())
 
 
 @app.route('/')
 @app.route('/home', methods=['GET', 'POST'])
 def check():
     try:
+        context= new_context()
         clear()
         display_type= None
-        context['name'] = False
-        context['status'] = False
-        context['extra'] = False
-        context['names']= ['tab', 'fasta', 'tab_noheaders', 'relaxed_phylip', 'phylip', 'fastq', 'nexus', 'genbank', 'fasta_gbexport', 'moid_fas']
-        context['outputs']= ['tab', 'fasta', 'tab_noheaders', 'relaxed_phylip', 'phylip', 'fastq', 'nexus', 'fasta_gbexport', 'moid_fas']
         if request.method == "POST":
             display_type = request.form.get("customRadio", None)
             print(display_type)
@@ -55,34 +259,17 @@ def check():
         return render(request, template_name, context)
 
 
-def paste_convert(inputdata, outfile_path, informat_name= None, outformat_name= None, disable_automatic_renaming= False, allow_empty_sequences= False):
-    informat = parse_format(informat_name, ext_pair= ("", ""))
-    outformat = parse_format(outformat_name, ext_pair= ("", ""))
-    infile = inputdata
-    with infile, open(outfile_path, mode="w") as outfile:
-        convertDNA(infile, outfile, informat=informat, outformat=outformat, allow_empty_sequences= allow_empty_sequences, disable_automatic_renaming= disable_automatic_renaming)
-
-
-
 @app.route('/')
 @app.route('/upload', methods=['GET', 'POST'])
 def upload():
+    context= new_context()
     try:
-        if os.path.exists(os.path.join(app.config['output'], 'result.txt')):
-            os.remove(os.path.join(app.config['output'], 'result.txt'))
-        if os.path.exists(os.path.join(basedir, 'output.zip')):
-            os.remove(os.path.join(basedir, 'output.zip'))
-
-        input= os.path.join(app.config['uploads'], 'input')
-        if os.path.isdir(input):
-            shutil.rmtree(input, ignore_errors=True)
+        workspace= new_workspace()
+        input= workspace.input_dir
         os.mkdir(input)
-        result= os.path.join(app.config['output'], 'result')
-        if os.path.isdir(result):
-            shutil.rmtree(result, ignore_errors=True)
+        result= workspace.result_dir
         os.mkdir(result)
-        options['allow_empty_sequences'] = False
-        options['disable_automatic_renaming'] = False
+        options= new_options()
 
         if request.method == 'POST':
             input_format= request.form['u1']
@@ -104,25 +291,40 @@ def upload():
                 filename = secure_filename(file.filename)
                 file.save(os.path.join(input, filename))
 
-        from dna.DNAconvert import convert_wrapper
-        convert_wrapper(
-            input,
-            result,
-            input_format,
-            output_format,
-            allow_empty_sequences= options['allow_empty_sequences'],
-            disable_automatic_renaming= options['disable_automatic_renaming'],
-        )
+        from dna.batch import convert_batch
+        conversion_start= time.perf_counter()
+        with workspace.in_use():
+            file_results= convert_batch(
+                input,
+                result,
+                input_format,
+                output_format,
+                allow_empty_sequences= options['allow_empty_sequences'],
+                disable_automatic_renaming= options['disable_automatic_renaming'],
+                workers= app.config.get('conversion_workers'),
+                cache= result_cache(),
+                **profiling_options(workspace),
+            )
+        # the profiling reports are shown on the result page
+        context['profiles']= {file_result.filename: file_result.profile for file_result in file_results if file_result.profile}
+        file_errors= sum(1 for file_result in file_results if file_result.error)
+        record_conversion(format_label(input_format, input_formats), format_label(output_format, output_formats),
+                          time.perf_counter() - conversion_start, directory_size(input), directory_size(result),
+                          error= bool(file_results) and file_errors == len(file_results), file_errors= file_errors)
+        for file_result in file_results:
+            for warning in file_result.warnings:
+                flash(f'{file_result.filename}: {warning}')
+            if file_result.error:
+                flash(f'{file_result.filename} could not be converted: {file_result.error}')
+        if file_results and all(file_result.error for file_result in file_results):
+            raise ValueError('none of the files could be converted')
         context['name'] = True
         context['status'] = False
         context['extra'] = True
 
         template_name = 'last.html'
-        dir_name = os.path.join(app.config['output'], 'result')
-        shutil.make_archive(app.config['output'], 'zip', dir_name)
-
 
-        return render_template(template_name, context= context, names= context['names'], name= context['name'], status= context['status'], extra= context['extra'])
+        return render_template(template_name, context= context, names= context['names'], name= context['name'], status= context['status'], extra= context['extra'], profiles= context['profiles'])
 
     except Exception as e:
         clear()
@@ -132,17 +334,55 @@ def upload():
 
 
 
+@app.route('/upload/stream', methods=['POST'])
+def upload_stream():
+    """
+    Converts the uploaded files while the body is being received, without saving them in the workspace
+
+    The formats and the options are given in the query string as u1, u2, u3, u4,
+    because the form fields may follow the files in the body.
+    Returns the results of the files, the converted files are downloaded from /download
+    """
+    boundary= request.mimetype_params.get('boundary')
+    if request.mimetype != 'multipart/form-data' or not boundary:
+        return jsonify(error= 'multipart/form-data body expected'), 400
+    workspace= new_workspace()
+    os.mkdir(workspace.result_dir)
+    input_format= request.args.get('u1')
+    output_format= request.args.get('u2')
+    formats= (format_label(input_format, input_formats), format_label(output_format, output_formats))
+    conversion_start= time.perf_counter()
+    try:
+        with workspace.in_use():
+            file_results= convert_multipart(
+                request.stream,
+                boundary,
+                workspace.result_dir,
+                input_format,
+                output_format,
+                allow_empty_sequences= bool(request.args.get('u3')),
+                disable_automatic_renaming= bool(request.args.get('u4')),
+                **profiling_options(workspace),
+            )
+    except Exception as e:
+        record_conversion(*formats, time.perf_counter() - conversion_start, request.content_length or 0, 0, error= True)
+        clear()
+        return jsonify(error= str(e)), 400
+    # the body is not saved, its size includes the multipart headers
+    file_errors= sum(1 for file_result in file_results if file_result.error)
+    record_conversion(*formats, time.perf_counter() - conversion_start, request.content_length or 0, directory_size(workspace.result_dir),
+                      error= bool(file_results) and file_errors == len(file_results), file_errors= file_errors)
+    return jsonify(files= [asdict(file_result) for file_result in file_results], result= url_for('download'))
+
+
 @app.route('/')
 @app.route('/paste', methods=['GET', 'POST'])
 def paste():
+    context= new_context()
     try:
-        if os.path.exists(os.path.join(app.config['output'], 'result.txt')):
-            os.remove(os.path.join(app.config['output'], 'result.txt'))
-        if os.path.exists(os.path.join(basedir, 'output.zip')):
-            os.remove(os.path.join(basedir, 'output.zip'))
-        options['allow_empty_sequences'] = False
-        options['disable_automatic_renaming'] = False
-        outfile_path = os.path.join(app.config['output'], 'result.txt')
+        workspace= new_workspace()
+        options= new_options()
+        outfile_path = workspace.result_file
         if request.method == "POST":
             content = request.form['content']
             content= io.StringIO(content)
@@ -152,12 +392,27 @@ def paste():
                 options['allow_empty_sequences'] = True
             if request.form.get('p4'):
                 options['disable_automatic_renaming'] = True
-            paste_convert(content, outfile_path, informat_name= input_format, outformat_name= output_format, allow_empty_sequences= options['allow_empty_sequences'], disable_automatic_renaming= options['disable_automatic_renaming'])
+            profiling= profiling_options(workspace)
+            formats= (format_label(input_format, input_formats), format_label(output_format, output_formats))
+            # the size of the form approximates the size of the text, without copying it
+            input_bytes= request.content_length or 0
+            conversion_start= time.perf_counter()
+            try:
+                with workspace.in_use():
+                    report= paste_convert(content, outfile_path, informat_name= input_format, outformat_name= output_format, allow_empty_sequences= options['allow_empty_sequences'], disable_automatic_renaming= options['disable_automatic_renaming'], cache= result_cache(),
+                                          profile= profiling['profile'], pstats_path= profiling['pstats_dir'] and os.path.join(profiling['pstats_dir'], 'paste.pstats'))
+            except Exception:
+                record_conversion(*formats, time.perf_counter() - conversion_start, input_bytes, 0, error= True)
+                raise
+            record_conversion(*formats, time.perf_counter() - conversion_start, input_bytes, os.path.getsize(outfile_path), error= False)
+            # the profiling report is shown on the result page
+            if report:
+                context['profiles']= {'paste': report}
         context['name'] = False
         context['extra'] = True
         context['status']= True
         template_name= "last.html"
-        return render_template("last.html", context= context, names= context['names'], extra= context['extra'], name= context['name'], status= context['status'])
+        return render_template("last.html", context= context, names= context['names'], extra= context['extra'], name= context['name'], status= context['status'], profiles= context['profiles'])
 
     except Exception as e:
         clear()
@@ -166,7 +421,46 @@ def paste():
         return render_template('error.html')
 
 
+@app.route('/paste/stream', methods=['POST'])
+def paste_stream():
+    """
+    Converts the request body and sends the converted text back while the body is being received
+
+    The body is the pasted text in UTF-8, not a form, so neither the input nor the result is kept whole.
+    The formats and the options are given in the query string as p1, p2, p3, p4, like the fields of /paste.
+    The errors found before the first converted text are returned as JSON with the status 400,
+    the later ones interrupt the response
+    """
+    input_format= request.args.get('p1')
+    output_format= request.args.get('p2')
+    formats= (format_label(input_format, input_formats), format_label(output_format, output_formats))
+    conversion_start= time.perf_counter()
+
+    def on_finish(input_bytes, output_bytes, error):
+        record_conversion(*formats, time.perf_counter() - conversion_start, input_bytes, output_bytes, error= error is not None)
+
+    try:
+        chunks= convert_paste_stream(
+            request.stream,
+            input_format,
+            output_format,
+            allow_empty_sequences= bool(request.args.get('p3')),
+            disable_automatic_renaming= bool(request.args.get('p4')),
+            on_finish= on_finish,
+        )
+        # the first chunk shows whether the conversion has started
+        first_chunk= next(chunks, b'')
+    except Exception as e:
+        return jsonify(error= str(e)), 400
+    return Response(stream_with_context(itertools.chain([first_chunk], chunks)), mimetype='text/plain',
+                    headers={'Content-Disposition': 'attachment; filename=result.txt'})
+
 
 def clear():
-    outputfile= {}
-    context= {'name': False, 'status': False, 'extra': False}
+    """
+    Removes the workspace of the last job of the session
+    """
+    workspace= current_workspace()
+    if workspace is not None:
+        workspace.cleanup()
+    session.pop('job', None)
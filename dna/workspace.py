@@ -0,0 +1,111 @@
+from contextlib import contextmanager
+from typing import Iterator, Optional
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+
+
+# workspaces that were not modified for this amount of seconds are removed
+WORKSPACE_TTL = 3600
+# the workspaces in use are touched after this amount of seconds, much less than any time to live
+WORKSPACE_TOUCH_INTERVAL = 60
+
+# job ids are uuid4 in hex form, anything else is not a workspace
+_job_id_regex = re.compile(r'[0-9a-f]{32}')
+
+
+class Workspace():
+    """
+    Directory with the files of one conversion job
+
+    Each request works in its own workspace, so concurrent conversions don't share any paths.
+    The workspace is identified by the job id, which is the name of its directory.
+    """
+
+    def __init__(self, root: str, job_id: str):
+        if not _job_id_regex.fullmatch(job_id):
+            raise ValueError(f"Invalid job id {job_id}")
+        self.root = root
+        self.job_id = job_id
+        self.path = os.path.join(root, job_id)
+        # the uploaded files
+        self.input_dir = os.path.join(self.path, 'input')
+        # the converted uploaded files
+        self.result_dir = os.path.join(self.path, 'result')
+        # the pasted text of a background job
+        self.input_file = os.path.join(self.path, 'input.txt')
+        # the converted pasted text
+        self.result_file = os.path.join(self.path, 'result.txt')
+        # the state of a background job
+        self.status_file = os.path.join(self.path, 'status.json')
+        # the cProfile statistics of the profiled conversions, they expire with the workspace
+        self.pstats_dir = os.path.join(self.path, 'pstats')
+
+    @classmethod
+    def create(cls, root: str) -> 'Workspace':
+        """Creates a new empty workspace in the root directory"""
+        os.makedirs(root, exist_ok=True)
+        workspace = cls(root, uuid.uuid4().hex)
+        os.mkdir(workspace.path)
+        return workspace
+
+    @classmethod
+    def open(cls, root: str, job_id: Optional[str]) -> Optional['Workspace']:
+        """Returns the existing workspace with the given job id or None"""
+        if not job_id or not _job_id_regex.fullmatch(job_id):
+            return None
+        workspace = cls(root, job_id)
+        try:
+            # the time to live counts from the last use
+            os.utime(workspace.path)
+        except OSError:
+            return None
+        return workspace
+
+    @contextmanager
+    def in_use(self, interval: float = WORKSPACE_TOUCH_INTERVAL) -> Iterator[None]:
+        """
+        Keeps the workspace from expiring while the block runs
+
+        The workspace is touched every interval seconds by a thread,
+        since a conversion can take longer than the time to live
+        """
+        stopped = threading.Event()
+
+        def touch() -> None:
+            while not stopped.wait(interval):
+                try:
+                    os.utime(self.path)
+                except OSError:
+                    # removed by the user
+                    return
+        thread = threading.Thread(target=touch, daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stopped.set()
+            thread.join()
+
+    def cleanup(self) -> None:
+        """Removes the workspace with all its files"""
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def cleanup_workspaces(root: str, ttl: float = WORKSPACE_TTL) -> None:
+    """Removes the workspaces in the root directory that are older than ttl seconds"""
+    if not os.path.isdir(root):
+        return
+    deadline = time.time() - ttl
+    for job_id in os.listdir(root):
+        path = os.path.join(root, job_id)
+        try:
+            expired = os.path.getmtime(path) < deadline
+        except OSError:
+            # removed by another process
+            continue
+        if expired and _job_id_regex.fullmatch(job_id):
+            shutil.rmtree(path, ignore_errors=True)
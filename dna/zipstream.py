@@ -0,0 +1,100 @@
+from typing import Callable, Iterator, List, Optional
+import io
+import os
+import queue
+import threading
+import zipfile
+
+
+# the size of the chunks in which the zip archive is sent
+ZIP_STREAM_CHUNK_SIZE = 1 << 16
+# the maximal number of chunks that wait to be sent
+ZIP_STREAM_QUEUE_SIZE = 16
+
+
+def _put(chunks: queue.Queue, cancelled: threading.Event, chunk: Optional[bytes]) -> bool:
+    """
+    Waits until the chunk is put into the queue.
+    Returns False if the consumer stopped reading
+    """
+    while not cancelled.is_set():
+        try:
+            chunks.put(chunk, timeout=0.1)
+        except queue.Full:
+            continue
+        return True
+    return False
+
+
+class _QueueWriter(io.RawIOBase):
+    """
+    Unseekable binary file that puts everything written to it into a queue
+    """
+
+    def __init__(self, chunks: queue.Queue, cancelled: threading.Event):
+        self._chunks = chunks
+        self._cancelled = cancelled
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b: bytes) -> int:
+        chunk = bytes(b)
+        if not _put(self._chunks, self._cancelled, chunk):
+            raise BrokenPipeError("The zip stream has been closed")
+        return len(chunk)
+
+
+def zip_stream(build: Callable[[zipfile.ZipFile], None], compression: int = zipfile.ZIP_DEFLATED) -> Iterator[bytes]:
+    """
+    Returns iterator over the chunks of a zip archive
+
+    build receives the archive and adds the entries to it,
+    for example through ZipFile.open(name, mode='w').
+    It runs in a separate thread, so the chunks are yielded while the entries are being written.
+    """
+    chunks: queue.Queue = queue.Queue(maxsize=ZIP_STREAM_QUEUE_SIZE)
+    cancelled = threading.Event()
+    errors: List[BaseException] = []
+
+    def producer() -> None:
+        try:
+            with io.BufferedWriter(_QueueWriter(chunks, cancelled), ZIP_STREAM_CHUNK_SIZE) as out:
+                with zipfile.ZipFile(out, mode='w', compression=compression) as archive:
+                    build(archive)
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            # signals the end of the archive
+            _put(chunks, cancelled, None)
+
+    thread = threading.Thread(target=producer, daemon=True)
+    thread.start()
+    try:
+        while True:
+            chunk = chunks.get()
+            if chunk is None:
+                break
+            yield chunk
+    finally:
+        # stop the producer if the response is closed early
+        cancelled.set()
+    thread.join()
+    if errors and not isinstance(errors[0], BrokenPipeError):
+        raise errors[0]
+
+
+def zip_directory(directory: str) -> Iterator[bytes]:
+    """
+    Returns iterator over the chunks of a zip archive with the content of the directory
+
+    The files are already complete, the converters write them into the directory before the download.
+    Only the archive is not stored: it's compressed while it's being sent
+    """
+    def build(archive: zipfile.ZipFile) -> None:
+        for dirpath, dirnames, filenames in os.walk(directory):
+            dirnames.sort()
+            for name in dirnames + sorted(filenames):
+                path = os.path.join(dirpath, name)
+                archive.write(path, arcname=os.path.relpath(path, directory))
+    return zip_stream(build)
@@ -0,0 +1,71 @@
+import http.client
+import io
+import sys
+import threading
+import types
+from unittest import mock
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+
+from dna.pastestream import PASTE_STREAM_CHUNK_SIZE, convert_paste_stream
+
+
+def _line_converter(infile, outfile, informat, outformat, allow_empty_sequences=False, disable_automatic_renaming=False):
+    """Writes each line as soon as it's read, like the FASTA converters"""
+    for line in infile:
+        outfile.write(line.upper())
+
+
+# replaces the converter, so the test doesn't depend on the formats
+_fake_dnaconvert = types.SimpleNamespace(convertDNA=_line_converter, parse_format=lambda name, ext_pair: name)
+
+
+class _LimitedInput(io.RawIOBase):
+    """The request body, that ends after CONTENT_LENGTH bytes, like the input of the WSGI servers"""
+
+    def __init__(self, stream, length):
+        self._stream = stream
+        self._remaining = length
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        data = self._stream.read(min(len(b), self._remaining))
+        self._remaining -= len(data)
+        b[:len(data)] = data
+        return len(data)
+
+
+def _app(environ, start_response):
+    body = io.BufferedReader(_LimitedInput(environ['wsgi.input'], int(environ['CONTENT_LENGTH'])))
+    chunks = convert_paste_stream(body, 'fasta', 'fasta')
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return chunks
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def test_body_larger_than_buffers_is_sent_before_reading():
+    # much more than the socket buffers and the chunks that the old queue held
+    record = b">seq\n" + b"acgt" * 250 + b"\n"
+    body = record * (20 * (1 << 20) // len(record))
+    assert len(body) > 64 * PASTE_STREAM_CHUNK_SIZE
+
+    with mock.patch.dict(sys.modules, {'dna.DNAconvert': _fake_dnaconvert}):
+        server = make_server('127.0.0.1', 0, _app, handler_class=_QuietHandler)
+        thread = threading.Thread(target=server.handle_request, daemon=True)
+        thread.start()
+        try:
+            # http.client sends the whole body before reading the response
+            connection = http.client.HTTPConnection('127.0.0.1', server.server_port, timeout=30)
+            connection.request('POST', '/paste/stream', body=body)
+            response = connection.getresponse()
+            converted = response.read()
+            connection.close()
+        finally:
+            thread.join(30)
+            server.server_close()
+    assert converted == body.upper()